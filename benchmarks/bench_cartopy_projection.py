@@ -0,0 +1,92 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+Benchmark of drawing glyphs on a Mercator map. The points are drawn
+one at a time with add_point, where each scatter carries a PlateCarree
+transform that cartopy projects separately, and with add_points, which
+projects all points in one call and draws them as one collection. The
+time to add the glyphs and to render the figure is reported for each.
+
+Usage:
+    python benchmarks/bench_cartopy_projection.py [--points N]
+"""
+
+import argparse
+import io
+import time
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from vizent.glyph_table import GlyphTable, shape_names
+from vizent.scales import get_scales
+from vizent.vizent_plot import add_point, add_points, mercator, plate_carree
+
+extent = [-10, 2, 49, 61]
+
+def map_axes():
+    fig = Figure(figsize=(8, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(projection=mercator)
+    ax.set_extent(extent, crs=plate_carree)
+    return fig, ax
+
+def add_one_at_a_time(ax, x, y, colour, shape, size, scales):
+    (scale_diverges, colour_scale, colour_mapping, shape_scale,
+     frequency_scale) = scales
+    # classified together, so only drawing differs between the methods
+    table = GlyphTable.from_values(x, y, colour, shape, size, "viridis",
+                                   colour_mapping, shape_scale,
+                                   frequency_scale, "sine", "sine", "square",
+                                   scale_diverges, "closest")
+    colours = table.palette[table.colour_index]
+    for i in range(len(table)):
+        add_point(x[i], y[i], shape_names[table.shape_id[i]],
+                  frequency_scale[table.frequency_index[i]], colours[i],
+                  size[i], ax, use_cartopy=True)
+
+def add_vectorised(ax, x, y, colour, shape, size, scales):
+    (scale_diverges, colour_scale, colour_mapping, shape_scale,
+     frequency_scale) = scales
+    add_points(ax, x, y, colour, shape, size, "viridis", colour_mapping,
+               shape_scale, frequency_scale, "sine", "sine", "square",
+               scale_diverges, "closest", use_cartopy=True)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of glyphs drawn on a Mercator map")
+    parser.add_argument("--points", type=int, default=10000)
+    args = parser.parse_args()
+    n = args.points
+    rng = np.random.default_rng(0)
+    x = rng.uniform(extent[0], extent[1], n)
+    y = rng.uniform(extent[2], extent[3], n)
+    colour = rng.normal(10, 5, n)
+    shape = rng.uniform(0, 4, n)
+    size = np.full(n, 5.0)
+    scales = get_scales(colour, shape, "viridis", None, None, None, None,
+                        None, None, None, None, None, 1)
+
+    print("{0:20} {1:>10} {2:>12}".format("method", "add (s)", "render (s)"))
+    for name, method in [("add_point per point", add_one_at_a_time),
+                         ("add_points", add_vectorised)]:
+        fig, ax = map_axes()
+        start = time.perf_counter()
+        method(ax, x, y, colour, shape, size, scales)
+        added = time.perf_counter()
+        fig.savefig(io.BytesIO(), format="png", dpi=100)
+        rendered = time.perf_counter()
+        print("{0:20} {1:10.2f} {2:12.2f}".format(name, added - start,
+                                                  rendered - added))
+
+if __name__ == "__main__":
+    main()
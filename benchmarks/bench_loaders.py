@@ -0,0 +1,120 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+Benchmark of load_points against reading a whole file into pandas and
+converting its columns to lists, the usual route into vizent_plot.
+Load time and peak memory are measured for Parquet, CSV and NetCDF
+files, with and without an extent. Each load runs in a fresh process
+so that peak memory is not shared between runs.
+
+Usage:
+    python benchmarks/bench_loaders.py [--rows N]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import numpy as np
+
+# columns that are stored but not plotted
+extra_columns = ["station", "pressure", "humidity", "wind_speed",
+                 "wind_direction", "rainfall"]
+
+def write_files(directory, rows):
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"x": rng.uniform(-10, 2, rows),
+                          "y": rng.uniform(49, 61, rows),
+                          "colour": rng.normal(10, 5, rows),
+                          "shape": rng.uniform(0, 4, rows),
+                          "size": np.full(rows, 20.0)})
+    for name in extra_columns:
+        frame[name] = rng.normal(size=rows)
+    # sorted by latitude, so parquet row groups cover bands of the map
+    frame = frame.sort_values("y", ignore_index=True)
+    paths = {"parquet": os.path.join(directory, "points.parquet"),
+             "csv": os.path.join(directory, "points.csv"),
+             "netcdf": os.path.join(directory, "points.nc")}
+    frame.to_parquet(paths["parquet"], row_group_size=65536)
+    frame.to_csv(paths["csv"], index=False)
+    frame.to_xarray().to_netcdf(paths["netcdf"])
+    return paths
+
+def load_with_vizent(path, extent):
+    from vizent import load_points
+    return load_points(path, extent=extent)
+
+def load_with_pandas(path, extent):
+    import pandas as pd
+    if path.endswith(".parquet"):
+        frame = pd.read_parquet(path)
+    elif path.endswith(".csv"):
+        frame = pd.read_csv(path)
+    else:
+        import xarray as xr
+        with xr.open_dataset(path) as dataset:
+            frame = dataset.to_dataframe()
+    if extent is not None:
+        frame = frame[(frame["x"] >= extent[0]) & (frame["x"] <= extent[1])
+                      & (frame["y"] >= extent[2]) & (frame["y"] <= extent[3])]
+    return tuple(frame[name].tolist()
+                 for name in ["x", "y", "colour", "shape", "size"])
+
+def _measure(loader, path, extent, results):
+    # runs in a fresh process; peak memory is reported relative to the
+    # process after imports
+    import pandas, pyarrow.dataset, xarray, vizent
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    values = loader(path, extent)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux
+    results.put((elapsed, (peak - before) / 1024, len(values[0])))
+
+def measure(loader, path, extent):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure,
+                              args=(loader, path, extent, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of load_points against pandas")
+    parser.add_argument("--rows", type=int, default=2000000)
+    args = parser.parse_args()
+    extent = [-4, -1, 54, 56]
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_files(directory, args.rows)
+        print("{0:8} {1:8} {2:8} {3:>10} {4:>14} {5:>10}".format(
+              "format", "extent", "loader", "time (s)", "peak (MiB)",
+              "points"))
+        for file_format, path in paths.items():
+            for use_extent in [False, True]:
+                for name, loader in [("pandas", load_with_pandas),
+                                     ("vizent", load_with_vizent)]:
+                    elapsed, peak, n = measure(
+                        loader, path, extent if use_extent else None)
+                    print("{0:8} {1:8} {2:8} {3:10.2f} {4:14.1f} "
+                          "{5:10d}".format(file_format, str(use_extent),
+                                           name, elapsed, peak, n))
+
+if __name__ == "__main__":
+    main()
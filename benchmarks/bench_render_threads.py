@@ -0,0 +1,60 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+Benchmark of vizent_render throughput from a thread pool. The same
+plots are rendered with increasing numbers of threads, up to the
+number of cores, and the plots rendered per second are reported.
+
+Usage:
+    python benchmarks/bench_render_threads.py [--plots N] [--points N]
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from vizent import vizent_render
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of vizent_render throughput across threads")
+    parser.add_argument("--plots", type=int, default=32)
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--dpi", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    plots = [(rng.uniform(0, 10, args.points), rng.uniform(0, 10, args.points),
+              rng.normal(i, 3, args.points), rng.uniform(0, 2, args.points),
+              [20]*args.points) for i in range(args.plots)]
+
+    def render(plot):
+        return vizent_render(*plot, dpi=args.dpi)
+
+    # warm up caches shared between renders, e.g. fonts and markers
+    render(plots[0])
+    print("{0:>8} {1:>10} {2:>14}".format("threads", "time (s)",
+                                          "plots per s"))
+    threads = 1
+    while threads <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(render, plots))
+        elapsed = time.perf_counter() - start
+        print("{0:8d} {1:10.2f} {2:14.1f}".format(threads, elapsed,
+                                                  args.plots / elapsed))
+        threads *= 2
+
+if __name__ == "__main__":
+    main()
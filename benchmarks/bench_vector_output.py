@@ -0,0 +1,88 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+Benchmark of PDF and SVG output with and without rasterize. For each
+format the file size and save time are reported, and the time taken
+to open and render the file at 150 dpi, with pdftoppm for PDF and
+rsvg-convert for SVG, where those tools are installed.
+
+Usage:
+    python benchmarks/bench_vector_output.py [--points N] [--cartopy]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import numpy as np
+from vizent import vizent_render
+
+# command lines that render a file to PNG at 150 dpi
+viewers = {"pdf": ["pdftoppm", "-r", "150", "-png", "{0}", "{1}"],
+           "svg": ["rsvg-convert", "--dpi-x", "150", "--dpi-y", "150",
+                   "-o", "{1}.png", "{0}"]}
+
+def render_time(file_format, path):
+    command = viewers[file_format]
+    if shutil.which(command[0]) is None:
+        return None
+    command = [arg.format(path, path[:-4]) for arg in command]
+    start = time.perf_counter()
+    subprocess.run(command, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of PDF and SVG output with rasterize")
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--cartopy", action="store_true",
+                        help="draw the points on a map")
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+    n = args.points
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-6, 2, n)
+    y = rng.uniform(50, 56, n)
+    colour = rng.normal(10, 5, n)
+    shape = rng.uniform(0, 4, n)
+
+    print("{0:6} {1:10} {2:>11} {3:>9} {4:>11}".format(
+          "format", "rasterize", "size (KiB)", "save (s)", "render (s)"))
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in ["pdf", "svg"]:
+            for rasterize in [False, True]:
+                start = time.perf_counter()
+                data = vizent_render(x, y, colour, shape, [8]*n,
+                                     use_cartopy=args.cartopy,
+                                     rasterize=rasterize,
+                                     format=file_format, dpi=args.dpi)
+                saved = time.perf_counter() - start
+                path = os.path.join(directory, "plot{0}.{1}".format(
+                                    int(rasterize), file_format))
+                with open(path, "wb") as f:
+                    f.write(data)
+                rendered = render_time(file_format, path)
+                print("{0:6} {1:10} {2:11.0f} {3:9.2f} {4:>11}".format(
+                      file_format, str(rasterize), len(data)/1024, saved,
+                      "skipped" if rendered is None
+                      else "{0:.2f}".format(rendered)))
+    missing = [command[0] for command in viewers.values()
+               if shutil.which(command[0]) is None]
+    if missing:
+        print("Render times skipped: {0} not installed".format(
+              ", ".join(missing)))
+
+if __name__ == "__main__":
+    main()
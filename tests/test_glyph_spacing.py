@@ -0,0 +1,85 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+import numpy as np
+import pytest
+from vizent import interpolate_to_grid, vizent_figure
+from vizent.vizent_plot import plate_carree
+
+xr = pytest.importorskip("xarray")
+
+size = 15
+
+def grid_spacing_pixels(ax, x, y, use_cartopy):
+    # on-screen distance between neighbouring grid points in x and y
+    xs = np.unique(np.round(x, 6))
+    ys = np.unique(np.round(y, 6))
+    points = np.array([[xs[0], ys[0]], [xs[1], ys[0]], [xs[0], ys[1]]])
+    if use_cartopy:
+        points = ax.projection.transform_points(plate_carree, points[:, 0],
+                                                points[:, 1])[:, :2]
+    pixels = ax.transData.transform(points)
+    return abs(pixels[1, 0]-pixels[0, 0]), abs(pixels[2, 1]-pixels[0, 1])
+
+def glyph_pixels(fig):
+    return size * fig.dpi / 72
+
+@pytest.mark.parametrize("width, height, options", [
+    (1000, 4000, {}),
+    (1000, 4000, {"extent": [0, 1000, 0, 4000], "scale_x": 6,
+                  "scale_y": 12}),
+    (1000, 300, {"scale_y": 3, "show_legend": False}),
+    (1000, 1000, {"title": "Two\nlines"}),
+    (12, 12, {"use_cartopy": True, "extent": [-10, 2, 49, 61]}),
+])
+def test_interpolated_glyphs_do_not_overlap(width, height, options):
+    rng = np.random.default_rng(0)
+    n = 300
+    x = rng.uniform(0, width, n)
+    y = rng.uniform(0, height, n)
+    if options.get("use_cartopy"):
+        x, y = x - 10, y + 49
+    x, y, colour, shape = interpolate_to_grid(x, y, rng.normal(size=n),
+                                              rng.uniform(size=n),
+                                              size=size, **options)
+    fig, ax = vizent_figure(x, y, colour, shape, [size]*len(x), **options)
+    fig.canvas.draw()
+    spacing = grid_spacing_pixels(ax, x, y, options.get("use_cartopy"))
+    assert min(spacing) >= glyph_pixels(fig)
+
+@pytest.mark.parametrize("bounds, options", [
+    ([-3, -2.8, 50, 58], {"extent": [-3, -2.8, 50, 58]}),
+    ([-3, -2.8, 50, 58], {}),
+    ([0, 100, 0, 100], {"scale_x": 6, "scale_y": 12}),
+    ([-10, 2, 49, 61], {"use_cartopy": True, "extent": [-10, 2, 49, 61]}),
+    ([-10, 2, 49, 61], {"use_cartopy": True, "scale_x": 6, "scale_y": 6}),
+])
+def test_gridded_glyphs_do_not_overlap(bounds, options):
+    lon = np.linspace(bounds[0], bounds[1], 300)
+    lat = np.linspace(bounds[2], bounds[3], 300)
+    field = xr.DataArray(np.random.default_rng(0).random((300, 300)),
+                         coords={"lat": lat, "lon": lon},
+                         dims=["lat", "lon"])
+    fig, ax = vizent_figure(None, None, field, field, size, **options)
+    fig.canvas.draw()
+    glyphs = ax.collections[-1]
+    positions = (glyphs.get_offset_transform()
+                 - ax.transData).transform(glyphs.get_offsets())[::3]
+    x, y = positions[:, 0], positions[:, 1]
+    if options.get("use_cartopy"):
+        lonlat = plate_carree.transform_points(ax.projection, x, y)
+        x, y = lonlat[:, 0], lonlat[:, 1]
+    spacing = grid_spacing_pixels(ax, x, y, options.get("use_cartopy"))
+    assert min(spacing) >= glyph_pixels(fig)
@@ -0,0 +1,120 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+import tracemalloc
+import numpy as np
+from matplotlib.figure import Figure
+from vizent.glyph_table import (GlyphTable, draw_glyph_table, get_marker,
+                                get_marker_path, shape_names)
+from vizent.scales import get_scales
+
+def make_values(n, seed=0):
+    # colour and shape values, and the scales that classify them
+    rng = np.random.default_rng(seed)
+    colour = rng.normal(size=n)
+    shape = rng.uniform(-1, 1, n)
+    scales = get_scales(colour, shape, "viridis", None, None, None, None,
+                        None, None, None, None, None, 1)
+    return colour, shape, scales
+
+def make_table(x, y, values=None):
+    if values is None:
+        values = make_values(len(x))
+    colour, shape, (scale_diverges, colour_scale, colour_mapping,
+                    shape_scale, frequency_scale) = values
+    return GlyphTable.from_values(x, y, colour, shape,
+                                  np.full(len(x), 10.0), "viridis",
+                                  colour_mapping, shape_scale,
+                                  frequency_scale, "sine", "sine", "square",
+                                  scale_diverges, "closest")
+
+def drawn_positions(ax, collection):
+    # data coordinates of the collection's elements
+    to_data = collection.get_offset_transform() - ax.transData
+    return to_data.transform(collection.get_offsets())
+
+def test_peak_memory_at_a_million_points():
+    n = 10**6
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 1, n)
+    y = rng.uniform(0, 1, n)
+    values = make_values(n)
+    ax = Figure().add_subplot()
+    tracemalloc.start()
+    try:
+        table = make_table(x, y, values)
+        table_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        draw_glyph_table(ax, table)
+        draw_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # 16 bytes per point of columns, plus temporaries per chunk
+    assert table_peak / n < 32
+    # matplotlib holds an offset, size, transform, path and colour for
+    # each of the three elements of a glyph
+    assert draw_peak / n < 1024
+
+def test_positions_precise_far_from_origin():
+    x = 1.6e9 + np.arange(91, dtype=float)
+    y = np.full(91, -4.2e8)
+    table = make_table(x, y)
+    np.testing.assert_array_equal(table.origin[0] + table.x.astype(float), x)
+    ax = Figure().add_subplot()
+    collection, = draw_glyph_table(ax, table)
+    positions = drawn_positions(ax, collection)
+    np.testing.assert_array_equal(positions[::3, 0], x)
+    np.testing.assert_array_equal(positions[::3, 1], y)
+
+def test_take_and_concatenate_keep_positions():
+    x = np.array([5e8, 5e8+1, 5e8+2, 5e8+3])
+    y = np.array([1.0, 2.0, 3.0, 4.0])
+    table = make_table(x, y)
+    first = table.take(slice(0, 3))
+    assert first.origin == table.origin
+    second = make_table(x[3:] + 10, y[3:])
+    joined = GlyphTable.concatenate([first, second])
+    np.testing.assert_array_equal(joined.origin[0]
+                                  + joined.x.astype(float),
+                                  [5e8, 5e8+1, 5e8+2, 5e8+13])
+    np.testing.assert_array_equal(joined.origin[1]
+                                  + joined.y.astype(float), y)
+
+def test_glyphs_drawn_whole_in_point_order():
+    x = np.array([0.0, 0.25, 0.5])
+    table = make_table(x, x)
+    ax = Figure().add_subplot()
+    collection, = draw_glyph_table(ax, table, zorder=5)
+    assert collection.get_zorder() == 5
+    paths = collection.get_paths()
+    colours = collection.get_facecolors()
+    sizes = np.sqrt(collection.get_sizes())
+    assert len(paths) == 3*len(table)
+    circle = get_marker_path("o")
+    for i in range(len(table)):
+        outer, shape, inner = range(3*i, 3*i+3)
+        assert paths[outer] is circle and paths[inner] is circle
+        shape_path, scale = get_marker(
+            shape_names[table.shape_id[i]],
+            table.frequency_scale[table.frequency_index[i]])
+        assert paths[shape] is shape_path
+        np.testing.assert_array_equal(colours[outer], [0, 0, 0, 1])
+        np.testing.assert_array_equal(colours[shape], [1, 1, 1, 1])
+        np.testing.assert_array_equal(
+            colours[inner], table.palette[table.colour_index[i]])
+        np.testing.assert_allclose(sizes[[outer, shape, inner]],
+                                   [10, 10*scale, 6], rtol=1e-6)
+    np.testing.assert_array_equal(drawn_positions(ax, collection)[:, 0],
+                                  np.repeat(x, 3))
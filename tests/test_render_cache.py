@@ -0,0 +1,91 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+import hashlib
+import os
+import matplotlib
+import numpy as np
+import pytest
+from vizent import RenderCache, vizent_render
+from vizent.render_cache import _update_hash, colormap_token, render_key
+
+xr = pytest.importorskip("xarray")
+
+def key(value):
+    digest = hashlib.sha256()
+    _update_hash(digest, value)
+    return digest.hexdigest()
+
+@pytest.fixture
+def netcdf_file(tmp_path):
+    path = str(tmp_path / "field.nc")
+    xr.Dataset({"t": (("time", "y", "x"),
+                      np.arange(24.0).reshape(2, 3, 4)),
+                "v": (("time", "y", "x"), np.ones((2, 3, 4)))},
+               coords={"time": [0, 1], "x": np.arange(4),
+                       "y": np.arange(3)}).to_netcdf(path)
+    return path
+
+def test_invalid_colormap_keyed_as_viridis():
+    assert colormap_token("not a colormap") == colormap_token("viridis")
+
+def test_numeric_lists_keyed_by_values_and_type():
+    assert key([1.0, 2.0, 3.0]) == key([1.0, 2.0, 3.0])
+    assert key([1.0, 2.0, 3.0]) != key([1.0, 2.0, 4.0])
+    assert key([1, 2]) != key([1.0, 2.0])
+    assert key([1, 2]) != key((1, 2))
+    assert key([1, "a"]) != key([1, "b"])
+
+def test_dataset_keyed_by_variables(netcdf_file):
+    with xr.open_dataset(netcdf_file) as dataset:
+        first = key(dataset)
+        assert key(dataset[["t"]]) != first
+    with xr.open_dataset(netcdf_file) as dataset:
+        assert key(dataset) == first
+
+def test_lazy_field_keyed_without_loading(netcdf_file):
+    with xr.open_dataset(netcdf_file) as dataset:
+        field = dataset["t"].isel(time=0)
+        first = key(field)
+        assert (key(field.isel(x=slice(0, 2)))
+                != key(field.isel(x=slice(2, 4))))
+        # selecting a time leaves it as a scalar coordinate
+        assert key(dataset["t"].isel(time=1)) != first
+        assert not field.variable._in_memory
+        assert key(field.load()) != first
+    # rewriting the file changes its modification time
+    stat = os.stat(netcdf_file)
+    os.utime(netcdf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    with xr.open_dataset(netcdf_file) as dataset:
+        assert key(dataset["t"].isel(time=0)) != first
+
+def test_cached_render_of_each_time(netcdf_file):
+    cache = RenderCache()
+    with xr.open_dataset(netcdf_file) as dataset:
+        renders = [vizent_render(None, None, dataset["t"].isel(time=i),
+                                 dataset["v"].isel(time=i), 15, dpi=20,
+                                 cache=cache) for i in range(2)]
+        assert renders[1] == vizent_render(None, None,
+                                           dataset["t"].isel(time=1),
+                                           dataset["v"].isel(time=1), 15,
+                                           dpi=20)
+    assert renders[0] != renders[1]
+
+def test_rcparams_in_render_key():
+    params = {"colormap": "viridis"}
+    first = render_key(params, "png", 100)
+    with matplotlib.rc_context({"font.size": 20}):
+        assert render_key(params, "png", 100) != first
+    assert render_key(params, "png", 100) == first
@@ -0,0 +1,54 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from vizent import vizent_plot, vizent_render
+
+n_plots = 12
+
+def plot_args(seed):
+    rng = np.random.default_rng(seed)
+    n = 50
+    return (rng.uniform(0, 10, n), rng.uniform(0, 10, n),
+            rng.normal(seed, 3, n), rng.uniform(0, 2, n), [20]*n)
+
+def render(seed):
+    return vizent_render(*plot_args(seed), colormap="viridis",
+                         title="plot {0}".format(seed), dpi=50)
+
+def test_threaded_renders_match_serial():
+    serial = [render(seed) for seed in range(n_plots)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        threaded = list(executor.map(render, range(n_plots)))
+    assert threaded == serial
+    # different data gives different images
+    assert len(set(serial)) == n_plots
+
+def test_renders_leave_no_pyplot_figures():
+    plt.close("all")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(render, range(n_plots)))
+    assert plt.get_fignums() == []
+
+def test_saving_closes_figure(tmp_path):
+    plt.close("all")
+    vizent_plot(*plot_args(0), save=True,
+                file_name=str(tmp_path / "plot.png"), dpi=50)
+    assert (tmp_path / "plot.png").exists()
+    assert plt.get_fignums() == []
@@ -1 +1,10 @@
-from vizent.vizent_plot import vizent_plot
\ No newline at end of file
+__version__ = "1.0.1"
+
+from vizent.vizent_plot import vizent_plot, vizent_figure, vizent_render
+from vizent.tiles import vizent_tiles
+from vizent.scales import ScaleSummary, summarise, summarise_partitions
+from vizent.loaders import load_points, iter_point_batches
+from vizent.facets import vizent_facets
+from vizent.render_cache import RenderCache
+from vizent.interpolation import interpolate_to_grid
+from vizent.live import WindowedGlyphs
@@ -13,52 +13,127 @@ arXiv:1907.12879
 
 """
 
-import matplotlib.pyplot as plt
-from PIL import Image
 import os 
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+from PIL import Image
 
 # coordinate limits of available newcastle images (x=eastings), (y=northings)
 x_min = 423000
 x_max = 427000
 y_min = 562000
 y_max = 566000
+# each newcastle image covers a 1 km square and is named after the 
+# kilometre eastings and northings of its lower left corner
+tile_metres = 1000
+
+# set to a directory to also keep stitched newcastle mosaics on disk,
+# so that they are reused between sessions
+mosaic_cache_dir = None
+
+images_dir = os.path.join(os.path.split(os.path.abspath(__file__))[0], 
+                          "images")
+
+def _load_tile(tile_x, tile_y):
+    tile = Image.open(os.path.join(images_dir, 
+                                   "{0}{1}.png".format(tile_x, tile_y)))
+    tile.load()
+    return tile
 
-def get_image(x, y, image_type, image_file):
+@lru_cache(maxsize=8)
+def get_mosaic(box):
+    """
+    Returns a PIL image of the newcastle images stitched together and 
+    cropped to box, given as whole metres (x0, x1, y0, y1) within the
+    available area. Mosaics are cached in memory, and on disk if 
+    mosaic_cache_dir is set. The images needed are loaded in parallel.
+    """
+    x0, x1, y0, y1 = box
+    cache_file = None
+    if mosaic_cache_dir is not None:
+        cache_file = os.path.join(mosaic_cache_dir, 
+                                  "newcastle_{0}_{1}_{2}_{3}.png".format(*box))
+        if os.path.exists(cache_file):
+            mosaic = Image.open(cache_file)
+            mosaic.load()
+            return mosaic
+
+    tiles = [(tile_x, tile_y) 
+             for tile_x in range(x0//tile_metres, (x1-1)//tile_metres + 1)
+             for tile_y in range(y0//tile_metres, (y1-1)//tile_metres + 1)]
+    with ThreadPoolExecutor() as executor:
+        images = list(executor.map(lambda t: _load_tile(*t), tiles))
+    # pixels per metre, from the resolution of the images
+    scale = images[0].size[0] / tile_metres
+    mosaic = Image.new("RGBA", (round((x1-x0)*scale), round((y1-y0)*scale)))
+    for (tile_x, tile_y), image in zip(tiles, images):
+        # part of the tile inside the box, in metres
+        left = tile_x*tile_metres
+        bottom = tile_y*tile_metres
+        part = [max(x0, left), min(x1, left+tile_metres), 
+                max(y0, bottom), min(y1, bottom+tile_metres)]
+        # image rows run from north to south
+        crop = [round(v*scale) for v in (part[0]-left, 
+                                         bottom+tile_metres-part[3], 
+                                         part[1]-left, 
+                                         bottom+tile_metres-part[2])]
+        mosaic.paste(image.crop(crop), (round((part[0]-x0)*scale), 
+                                        round((y1-part[3])*scale)))
+
+    if cache_file is not None:
+        os.makedirs(mosaic_cache_dir, exist_ok=True)
+        # write to a temporary file first so readers never see a partial
+        # image
+        fd, temp_file = tempfile.mkstemp(suffix=".png", dir=mosaic_cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            mosaic.save(f, format="png")
+        os.replace(temp_file, cache_file)
+    return mosaic
+
+def get_image(x, y, image_type, image_file, extent=None):
+    """
+    Returns the background image (a file name or PIL image) and its 
+    extent. For image_type "newcastle", the 1 km images covering the
+    extent (the extent of the points, padded, if not given) are 
+    stitched together and cropped to it.
+    """
     lowest_x = min(x)
     highest_x = max(x)
     lowest_y = min(y)
     highest_y = max(y) 
 
-    diff_x = int(highest_x/1000) != int(lowest_x/1000)
-    diff_y = int(highest_y/1000) != int(lowest_y/1000)
-    extent = []
     if image_type == "newcastle":
+        if extent is None:
+            pad = max(highest_x-lowest_x, highest_y-lowest_y)/10
+            extent = [lowest_x-pad, highest_x+pad, lowest_y-pad, 
+                      highest_y+pad]
         if (lowest_x < x_min or highest_x >= x_max or 
                 lowest_y < y_min or highest_y >= y_max):
-            image = "no_map.png"
-        elif diff_x or diff_y:
-            image = "all.png"
-        else:
-            x_part = str(int(lowest_x/1000))
-            y_part = str(int(lowest_y/1000))
-            image = x_part + y_part + ".png"
-        extent = [int(x_part)*1000, int(x_part)*1000+1000, int(y_part)*1000, 
-                  int(y_part)*1000+1000]
+            return os.path.join(images_dir, "no_map.png"), extent
+        # whole metres, within the available area
+        box = (max(int(np.floor(extent[0])), x_min), 
+               min(int(np.ceil(extent[1])), x_max),
+               max(int(np.floor(extent[2])), y_min), 
+               min(int(np.ceil(extent[3])), y_max))
+        if box[1] <= box[0] or box[3] <= box[2]:
+            # a single point, so show the 1 km square containing it
+            tile_x = int(lowest_x//tile_metres)*tile_metres
+            tile_y = int(lowest_y//tile_metres)*tile_metres
+            box = (tile_x, tile_x+tile_metres, tile_y, tile_y+tile_metres)
+        return get_mosaic(box), list(box)
     elif image_type == "england":
-        image="england_map.png"
-        extent = [-6, 2, 49.9, 56]
+        return os.path.join(images_dir, "england_map.png"), [-6, 2, 49.9, 56]
     else:
-        image=image_file
-        extent=extent
-    
-    if image_type == "newcastle" or image_type == "england":
-        dirname = os.path.split(os.path.abspath(__file__))[0]
-        return "{0}\\images\\{1}".format(dirname,image), extent
-    else:
-        return image, extent
+        return image_file, extent
 
-def add_image_background(filename, ax1, extent):
-    im=Image.open(filename)
+def add_image_background(image, ax1, extent):
+    # image may be a file name or an already loaded PIL image
+    if isinstance(image, Image.Image):
+        im = image
+    else:
+        im = Image.open(image)
     asp = (im.size[1]/im.size[0])*((extent[1]-extent[0])/(extent[3]-extent[2]))
     ax1.imshow(im, extent=extent, zorder=0, aspect=asp)
     return asp
\ No newline at end of file
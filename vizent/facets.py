@@ -0,0 +1,198 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib import gridspec
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+from .glyph_shapes import shapes
+from .scales import *
+from .background_image import get_image, add_image_background
+from .vizent_plot import (add_points, add_legend, add_map_features,
+                          padded_extent, plate_carree, mercator)
+
+panel_keys = ["x_values", "y_values", "colour_values", "shape_values",
+              "size_values"]
+
+def vizent_facets(panels, ncols=None, panel_size=4, colormap="viridis",
+                  use_image=False, image_type=None, image_file=None,
+                  use_cartopy=False, extent=None, scale_diverges=None,
+                  shape="sine", shape_pos="sine", shape_neg="square",
+                  colour_max=None, colour_min=None, colour_n=None,
+                  colour_spread=None, shape_max=None, shape_min=None,
+                  shape_n=None, shape_spread=None,
+                  colour_label="temperature", shape_label="variance",
+                  title=None, show_axes=True, save=False,
+                  file_name="saved_plot.png", return_axes=False,
+                  scale_dp=1, interval_type="closest", show_legend=True,
+                  rasterize=False, dpi=500):
+    """
+    Draws a grid of glyph scatter plots (small multiples) in one
+    figure, e.g. for comparing regions or forecast members. Scales
+    are calculated once over the data of all panels, so glyphs mean
+    the same in every panel, and a single legend is drawn to the
+    right of the grid. Map features and background images are
+    prepared once and shared by all panels with the same extent.
+
+    Parameters:
+        panels (list of dicts): One dict per panel with keys
+                                x_values, y_values,
+                                colour_values, shape_values and
+                                size_values as for vizent_plot,
+                                and optionally title and
+                                extent.
+        ncols (int): Optional. Number of columns of panels.
+                     Defaults to a roughly square grid.
+        panel_size (float): Optional. Width and height of each
+                            panel in inches.
+        extent (list of floats): Optional. Extent used for
+                                 panels that do not specify
+                                 their own.
+        title (str): Optional. Title for the whole figure.
+        return_axes (bool): Optional. If True, the function
+                            will return fig and a list of the
+                            panel axes.
+        dpi (float): Optional. Resolution of the saved plot, or 
+                     of its rasterised parts with rasterize.
+
+        All other parameters are as for vizent_plot.
+    """
+    if not len(panels) > 0:
+        raise ValueError("No panels to plot")
+    for i, panel in enumerate(panels):
+        missing = [key for key in panel_keys if key not in panel]
+        if missing:
+            raise ValueError("panel {0} is missing {1}".format(i, missing))
+        if not (len(panel["x_values"]) == len(panel["y_values"])
+                == len(panel["colour_values"]) == len(panel["shape_values"])
+                == len(panel["size_values"])):
+            raise ValueError("x_values, y_values, colour_values, shape_values "
+                             "and size_values must all be of the same length "
+                             "in panel {0}".format(i))
+        if not len(panel["x_values"]) > 0:
+            raise ValueError("Empty input lists in panel {0}".format(i))
+    for name in [shape, shape_pos, shape_neg]:
+        if not name in shapes:
+            raise ValueError("'{0}' is not a supported shape.".format(name))
+
+    # scales from the merged summaries of all panels
+    (scale_diverges, colour_scale, colour_mapping, shape_scale,
+     frequency_scale) = get_scales(
+        merge_summaries(summarise(p["colour_values"]) for p in panels),
+        merge_summaries(summarise(p["shape_values"]) for p in panels),
+        colormap, scale_diverges, colour_max, colour_min, colour_n,
+        colour_spread, shape_max, shape_min, shape_n, shape_spread, scale_dp)
+
+    if ncols is None:
+        ncols = int(np.ceil(np.sqrt(len(panels))))
+    nrows = int(np.ceil(len(panels) / ncols))
+    legend_width = panel_size if show_legend else 0
+    scale_x = ncols*panel_size + legend_width
+    scale_y = nrows*panel_size
+    if return_axes or not save:
+        fig = plt.figure(figsize=(scale_x, scale_y))
+    else:
+        fig = Figure(figsize=(scale_x, scale_y))
+        FigureCanvasAgg(fig)
+    gs = gridspec.GridSpec(nrows, ncols+1, figure=fig,
+                           width_ratios=[1]*ncols + [1 if show_legend else 0])
+
+    # loaded background images, shared between panels
+    images = {}
+    axes = []
+    for i, panel in enumerate(panels):
+        panel_extent = panel.get("extent", extent)
+        if panel_extent is None and (use_cartopy or use_image):
+            panel_extent = padded_extent(panel["x_values"],
+                                         panel["y_values"])
+        subplot = gs[i // ncols, i % ncols]
+        if use_cartopy:
+            ax = fig.add_subplot(subplot, projection=mercator)
+            raster_artists = add_map_features(ax, panel_extent, show_axes)
+        else:
+            ax = fig.add_subplot(subplot)
+            raster_artists = []
+        if use_image:
+            image, image_extent = get_image(panel["x_values"],
+                                            panel["y_values"], image_type,
+                                            image_file, panel_extent)
+            if image_type=="newcastle" or image_type=="england":
+                panel_extent = image_extent
+            try:
+                # newcastle mosaics are already loaded and cached
+                if not isinstance(image, Image.Image):
+                    if image not in images:
+                        images[image] = Image.open(image)
+                        images[image].load()
+                    image = images[image]
+                add_image_background(image, ax, panel_extent)
+                raster_artists += ax.images
+            except:
+                print("Image file not found or not valid. Panel {0} will be "
+                      "created without image background.".format(i))
+        raster_artists += add_points(ax, panel["x_values"], panel["y_values"],
+                                     panel["colour_values"],
+                                     panel["shape_values"],
+                                     panel["size_values"], colormap,
+                                     colour_mapping, shape_scale,
+                                     frequency_scale, shape, shape_pos,
+                                     shape_neg, scale_diverges,
+                                     interval_type, use_cartopy)
+        if rasterize:
+            for artist in raster_artists:
+                artist.set_rasterized(True)
+        if panel_extent is not None:
+            if use_cartopy:
+                ax.set_extent(panel_extent, crs=plate_carree)
+            else:
+                ax.set_xlim(panel_extent[0], panel_extent[1])
+                ax.set_ylim(panel_extent[2], panel_extent[3])
+        else:
+            ax.margins(0.1)
+        if panel.get("title") is not None:
+            ax.set_title(panel["title"])
+        if not show_axes:
+            ax.axis('off')
+        axes.append(ax)
+
+    if show_legend:
+        ax_legend = fig.add_subplot(gs[:, -1])
+        # add_legend sizes glyphs for a legend a third of scale_x wide
+        add_legend(ax_legend, colour_scale, colormap, colour_mapping,
+                   shape_scale, frequency_scale, shape, shape_pos, shape_neg,
+                   scale_diverges, 3*legend_width, scale_y, colour_label,
+                   shape_label)
+
+    if title is not None:
+        delim_title = title.split("\n")
+        max_length = max(len(line) for line in delim_title)
+        font_size = min(18, 1.5*(scale_x/(max_length*0.014)))
+        fig.suptitle(title, fontsize=font_size, fontweight="bold")
+    fig.tight_layout()
+
+    if return_axes:
+        return fig, axes
+    elif save:
+        try:
+            fig.savefig(file_name, dpi=dpi)
+        except AttributeError:
+            raise AttributeError("The specified file name is invalid. File "
+                                 "name must be a string with or without a "
+                                 "valid image file extension")
+    else:
+        plt.show()
+        plt.close(fig)
@@ -0,0 +1,268 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+from functools import lru_cache
+import numpy as np
+from matplotlib.collections import PathCollection
+from matplotlib.markers import MarkerStyle
+from matplotlib.transforms import Affine2D, IdentityTransform
+from .glyph_shapes import shapes, get_shape_points
+from .metofficelimits import *
+from .scales import get_frequency_index
+
+# shape ids index this list
+shape_names = list(shapes)
+
+# points are classified in chunks to bound temporary memory
+chunk_size = 65536
+
+@lru_cache(maxsize=None)
+def get_marker_path(marker):
+    # path of a marker scaled to unit diameter, as drawn by scatter
+    if isinstance(marker, tuple):
+        marker = get_shape_points(*marker)
+    marker = MarkerStyle(marker)
+    return marker.get_path().transformed(marker.get_transform())
+
+@lru_cache(maxsize=None)
+def get_marker(shape, frequency):
+    # path of the shape and its largest absolute vertex value, which
+    # sizes the shape relative to the glyph
+    shape_points = get_shape_points(shape, frequency)
+    return (get_marker_path((shape, frequency)),
+            np.abs(shape_points).max())
+
+def get_palette(colormap, colour_mapping):
+    """
+    Returns the RGBA colours that colour indices refer to. For a
+    matplotlib colormap these are its N colours followed by its
+    under, over and bad colours.
+    """
+    if colormap == "metoffice":
+        return np.array([tuple(c) + (1.0,) for c in metOfficeColours])
+    cmap = colour_mapping.cmap
+    return np.vstack([cmap(np.arange(cmap.N)), cmap.get_under(),
+                      cmap.get_over(), cmap.get_bad()])
+
+def get_colour_indices(values, colormap, colour_mapping):
+    """
+    Vectorised get_colour, returning indices into get_palette.
+    """
+    values = np.asarray(values)
+    if colormap == "metoffice":
+        index = np.searchsorted(metOfficeLimits, values, side="left")
+        index[np.isnan(values)] = 0
+        if (index >= len(metOfficeLimits)).any():
+            raise IndexError("Data is outside of the limits of the metoffice "
+                             "scale. Select another colormap for this data.")
+        return index.astype(np.uint16)
+    # the same steps as matplotlib's Colormap.__call__
+    n_colours = colour_mapping.cmap.N
+    normed = colour_mapping.norm(values)
+    bad = np.ma.getmaskarray(normed) | np.isnan(np.ma.getdata(normed))
+    xa = np.array(np.ma.getdata(normed), copy=True)
+    xa *= n_colours
+    xa[xa == n_colours] = n_colours - 1
+    under = xa < 0
+    over = xa >= n_colours
+    with np.errstate(invalid="ignore"):
+        index = xa.astype(int)
+    index[under] = n_colours
+    index[over] = n_colours + 1
+    index[bad] = n_colours + 2
+    return index.astype(np.uint16)
+
+def get_frequency_indices(values, shape_scale, interval_type):
+    """
+    Vectorised get_frequency, returning indices into the frequency
+    scale.
+    """
+    values = np.asarray(values, dtype=float)
+    scale = np.asarray(shape_scale, dtype=float)
+    n = len(scale)
+    if n == 1:
+        return np.zeros(len(values), dtype=np.uint8)
+    if interval_type not in ("closest", "limit"):
+        raise ValueError("The specified interval type for categorizing shapes "
+                         "values does not exist. Choose from 'closest' or "
+                         "'limit'")
+    if (np.diff(scale) < 0).any():
+        # searching needs an ascending scale, so classify one at a time
+        index = [get_frequency_index(v, shape_scale, interval_type)
+                 for v in values]
+        return (np.asarray(index, dtype=np.int64) % n).astype(np.uint8)
+    if interval_type == "closest":
+        index = np.minimum(np.searchsorted(scale, values, side="left"), n-1)
+        lower = np.maximum(index-1, 0)
+        step_down = ((index > 0) & (np.abs(values-scale[index])
+                                    > np.abs(values-scale[lower])))
+        index = index - step_down
+        index[np.isnan(values)] = 0
+    else:
+        index = np.where(values <= 0,
+                         np.searchsorted(scale, values, side="left"),
+                         np.searchsorted(scale, values, side="right") - 1)
+        if (index >= n).any():
+            raise IndexError("list index out of range")
+    # an index of -1 refers to the last value, as in get_frequency
+    return (index % n).astype(np.uint8)
+
+def get_shape_ids(values, shape, shape_pos, shape_neg, divergent):
+    """
+    Vectorised get_shape, returning indices into shape_names.
+    """
+    values = np.asarray(values)
+    if divergent:
+        return np.where(values <= 0, shape_names.index(shape_neg), 
+                        shape_names.index(shape_pos)).astype(np.uint8)
+    return np.full(len(values), shape_names.index(shape), dtype=np.uint8)
+
+def _finite_min(values):
+    # minimum of the finite values, without copying the whole array
+    minimum = np.inf
+    for start in range(0, len(values), chunk_size):
+        chunk = np.asarray(values[start:start+chunk_size], dtype=float)
+        chunk = chunk[np.isfinite(chunk)]
+        if len(chunk):
+            minimum = min(minimum, chunk.min())
+    return minimum if np.isfinite(minimum) else 0.0
+
+class GlyphTable:
+    """
+    Compact columnar description of the glyphs to draw: float32 
+    coordinates relative to a float64 origin, float32 sizes, a uint8
+    shape id (index into shape_names), a uint8 index into the frequency
+    scale and a uint16 index into a palette of RGBA colours. Storing
+    positions relative to the origin keeps them precise far from zero,
+    e.g. in projected map coordinates. Drawing works on whole columns,
+    so no Python objects are created per point.
+    """
+    def __init__(self, x, y, size, shape_id, frequency_index, colour_index,
+                 frequency_scale, palette, origin=(0.0, 0.0)):
+        self.x = x
+        self.y = y
+        self.size = size
+        self.shape_id = shape_id
+        self.frequency_index = frequency_index
+        self.colour_index = colour_index
+        self.frequency_scale = list(frequency_scale)
+        self.palette = palette
+        self.origin = (float(origin[0]), float(origin[1]))
+
+    def __len__(self):
+        return len(self.x)
+
+    @classmethod
+    def from_values(cls, x_values, y_values, colour_values, shape_values,
+                    size_values, colormap, colour_mapping, shape_scale,
+                    frequency_scale, shape, shape_pos, shape_neg, divergent,
+                    interval_type):
+        n = len(x_values)
+        x_values = np.asarray(x_values)
+        y_values = np.asarray(y_values)
+        table = cls(np.empty(n, dtype=np.float32),
+                    np.empty(n, dtype=np.float32),
+                    np.asarray(size_values, dtype=np.float32),
+                    np.empty(n, dtype=np.uint8), np.empty(n, dtype=np.uint8),
+                    np.empty(n, dtype=np.uint16), frequency_scale,
+                    get_palette(colormap, colour_mapping),
+                    (_finite_min(x_values), _finite_min(y_values)))
+        for start in range(0, n, chunk_size):
+            chunk = slice(start, start+chunk_size)
+            # subtract the origin in double precision
+            table.x[chunk] = x_values[chunk].astype(float) - table.origin[0]
+            table.y[chunk] = y_values[chunk].astype(float) - table.origin[1]
+            shape_chunk = np.asarray(shape_values[chunk])
+            table.shape_id[chunk] = get_shape_ids(shape_chunk, shape, 
+                                                  shape_pos, shape_neg, 
+                                                  divergent)
+            table.frequency_index[chunk] = get_frequency_indices(
+                shape_chunk, shape_scale, interval_type)
+            table.colour_index[chunk] = get_colour_indices(
+                np.asarray(colour_values[chunk]), colormap, colour_mapping)
+        return table
+
+    @classmethod
+    def concatenate(cls, tables):
+        """
+        Joins tables with the same frequency scale and palette into
+        one, relative to the smallest of their origins.
+        """
+        origin = (min(table.origin[0] for table in tables),
+                  min(table.origin[1] for table in tables))
+        x, y = [np.concatenate([(getattr(table, name).astype(float)
+                                 + table.origin[i] - origin[i])
+                                .astype(np.float32) for table in tables])
+                for i, name in enumerate(["x", "y"])]
+        return cls(x, y, *[np.concatenate([getattr(table, name)
+                                           for table in tables])
+                           for name in ["size", "shape_id",
+                                        "frequency_index", "colour_index"]],
+                   tables[-1].frequency_scale, tables[-1].palette, origin)
+
+    def take(self, index):
+        return GlyphTable(self.x[index], self.y[index], self.size[index],
+                          self.shape_id[index], self.frequency_index[index],
+                          self.colour_index[index], self.frequency_scale,
+                          self.palette, self.origin)
+
+def draw_glyph_table(ax, table, zorder=None, **kwargs):
+    """
+    Draws the glyphs in the table as a single collection, with the
+    outer circle, shape and inner circle of each glyph drawn in turn
+    so that later glyphs cover earlier ones whole. Returns a list of
+    the collection. Keyword arguments (e.g. transform, for positions
+    not in ax's data coordinates) are passed to the collection.
+    """
+    if len(table) == 0:
+        return []
+    n = len(table)
+    # each glyph is three elements of the collection: its outer circle,
+    # shape and inner circle
+    shape_paths = np.empty(256*len(shape_names), dtype=object)
+    shape_scales = np.empty(256*len(shape_names), dtype=np.float32)
+    keys = table.shape_id.astype(np.uint16)*256 + table.frequency_index
+    for key in np.unique(keys):
+        shape_paths[key], shape_scales[key] = get_marker(
+            shape_names[key // 256], table.frequency_scale[key % 256])
+    paths = np.empty((n, 3), dtype=object)
+    paths[:, 0] = paths[:, 2] = get_marker_path("o")
+    paths[:, 1] = shape_paths[keys]
+
+    sizes = np.empty((n, 3), dtype=np.float32)
+    sizes[:, 0] = table.size
+    sizes[:, 1] = table.size*shape_scales[keys]
+    sizes[:, 2] = table.size*0.6
+    colours = np.empty((n, 3, 4))
+    colours[:, 0] = (0, 0, 0, 1)
+    colours[:, 1] = (1, 1, 1, 1)
+    colours[:, 2] = table.palette[table.colour_index]
+    offsets = np.empty((n, 3, 2))
+    offsets[:, :, 0] = table.x[:, np.newaxis]
+    offsets[:, :, 1] = table.y[:, np.newaxis]
+
+    # positions are relative to the table's origin
+    offset_transform = (Affine2D().translate(*table.origin)
+                        + kwargs.pop("transform", ax.transData))
+    collection = PathCollection(paths.ravel(), np.square(sizes.ravel()),
+                                offsets=offsets.reshape(-1, 2),
+                                offset_transform=offset_transform,
+                                facecolors=colours.reshape(-1, 4),
+                                edgecolors="face", linewidths=0, **kwargs)
+    collection.set_transform(IdentityTransform())
+    if zorder is not None:
+        collection.set_zorder(zorder)
+    ax.add_collection(collection)
+    return [collection]
@@ -0,0 +1,128 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+import numpy as np
+
+# names recognised for the x and y dimensions of gridded fields
+x_names = ["x", "lon", "longitude", "grid_longitude", "easting", "eastings",
+           "projection_x_coordinate"]
+y_names = ["y", "lat", "latitude", "grid_latitude", "northing", "northings",
+           "projection_y_coordinate"]
+
+def is_gridded(values):
+    # xarray DataArray or Dataset, without requiring xarray to be installed
+    return hasattr(values, "dims") and hasattr(values, "coords")
+
+def _as_dataarray(field):
+    # a Dataset with a single data variable is treated as that variable
+    if hasattr(field, "data_vars"):
+        if len(field.data_vars) != 1:
+            raise ValueError("Datasets must contain a single data variable. "
+                             "Select the variable to plot, e.g. ds['name'].")
+        field = field[list(field.data_vars)[0]]
+    return field
+
+def _find_dim(field, names, fallback):
+    for dim in field.dims:
+        if str(dim).lower() in names:
+            return dim
+    if field.ndim == 2:
+        return field.dims[fallback]
+    raise ValueError("Could not identify the x and y dimensions of the "
+                     "gridded field. Dimensions should be named one of "
+                     "{0} and {1}".format(x_names, y_names))
+
+def _crop(field, dim, low, high):
+    coords = field[dim].values
+    if len(coords) > 1 and coords[0] > coords[-1]:
+        return field.sel({dim: slice(high, low)})
+    return field.sel({dim: slice(low, high)})
+
+def _stride(coords, spacing):
+    if len(coords) < 2:
+        return 1
+    resolution = np.abs(np.median(np.diff(coords)))
+    return max(1, int(np.ceil(spacing / resolution)))
+
+def grid_to_points(colour_field, shape_field, extent=None, spacing=None):
+    """
+    Converts gridded colour and shape fields into point lists for
+    vizent_plot. The fields are cropped to the extent and then
+    subsampled so that their grid points are at least the given
+    spacing apart, e.g. so that glyphs do not overlap. Cropping and subsampling happen before any data
+    is loaded, so for dask-backed fields only the chunks needed are
+    read. Grid cells where either field is missing are dropped.
+
+    Parameters:
+        colour_field (xarray DataArray or Dataset): 2D field of
+                      values to be represented by colour
+        shape_field (xarray DataArray or Dataset): 2D field of
+                     values to be represented by shape. It is
+                     sampled at the nearest grid points to those
+                     of the colour field.
+        extent (list of floats): Optional. [xmin, xmax, ymin,
+                                 ymax] in grid coordinates.
+                                 Defaults to the whole grid.
+        spacing (function): Optional. Takes the [xmin, xmax,
+                            ymin, ymax] of the cropped grid and
+                            returns the minimum spacing of points
+                            (x, y) in grid coordinates. By
+                            default all grid points are kept.
+
+    Returns:
+        x, y, colour and shape values as numpy arrays
+    """
+    colour_field = _as_dataarray(colour_field)
+    shape_field = _as_dataarray(shape_field)
+    if colour_field.ndim != 2 or shape_field.ndim != 2:
+        raise ValueError("Gridded fields must be 2D. Select a single time "
+                         "or level before plotting.")
+    x_dim = _find_dim(colour_field, x_names, 1)
+    y_dim = _find_dim(colour_field, y_names, 0)
+
+    if extent is not None:
+        colour_field = _crop(colour_field, x_dim, extent[0], extent[1])
+        colour_field = _crop(colour_field, y_dim, extent[2], extent[3])
+    x_coords = colour_field[x_dim].values
+    y_coords = colour_field[y_dim].values
+    if len(x_coords) == 0 or len(y_coords) == 0:
+        raise ValueError("The gridded field has no values within the extent")
+    spacing_x = spacing_y = 0
+    if spacing is not None:
+        spacing_x, spacing_y = spacing([x_coords.min(), x_coords.max(),
+                                        y_coords.min(), y_coords.max()])
+    colour_field = colour_field.isel({x_dim: slice(None, None,
+                                                   _stride(x_coords,
+                                                           spacing_x)),
+                                      y_dim: slice(None, None,
+                                                   _stride(y_coords,
+                                                           spacing_y))})
+    colour_field = colour_field.transpose(y_dim, x_dim)
+    x_coords = colour_field[x_dim].values
+    y_coords = colour_field[y_dim].values
+    shape_x_dim = _find_dim(shape_field, x_names, 1)
+    shape_y_dim = _find_dim(shape_field, y_names, 0)
+    shape_field = shape_field.sel({shape_x_dim: x_coords,
+                                   shape_y_dim: y_coords}, method="nearest")
+    shape_field = shape_field.transpose(shape_y_dim, shape_x_dim)
+
+    # only the subsampled values are loaded
+    colour_values = np.asarray(colour_field.values, dtype=float).ravel()
+    shape_values = np.asarray(shape_field.values, dtype=float).ravel()
+    x_values, y_values = [grid.ravel() for grid in
+                          np.meshgrid(x_coords, y_coords)]
+    present = np.isfinite(colour_values) & np.isfinite(shape_values)
+    return (x_values[present].astype(float), y_values[present].astype(float),
+            colour_values[present], shape_values[present])
@@ -0,0 +1,178 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+import numpy as np
+from .glyph_table import GlyphTable, draw_glyph_table
+
+# finest level of detail grid has at most 2**max_level cells per side
+max_level = 10
+
+class _Level:
+    """
+    Points binned into a 2**level by 2**level grid over the data.
+    Cells are sorted by row then column, so the cells of one row that
+    lie in view are a contiguous slice.
+    """
+    def __init__(self, level, x, y, colour, shape, size, bounds):
+        self.n_cells = 2**level
+        cx, cy = self.cell(x, y, bounds)
+        keys = cy*self.n_cells + cx
+        self.keys, inverse, counts = np.unique(keys, return_inverse=True,
+                                               return_counts=True)
+        # mean position and values of the points in each cell
+        self.values = [np.bincount(inverse, weights=v)/counts
+                       for v in (x, y, colour, shape, size)]
+
+    def cell(self, x, y, bounds):
+        cx = (x - bounds[0]) / (bounds[1]-bounds[0]) * self.n_cells
+        cy = (y - bounds[2]) / (bounds[3]-bounds[2]) * self.n_cells
+        return (np.clip(cx, 0, self.n_cells-1).astype(np.int64),
+                np.clip(cy, 0, self.n_cells-1).astype(np.int64))
+
+    def view_cells(self, view, bounds):
+        # range of cells (cx0, cx1, cy0, cy1) covering the view
+        (cx0, cx1), (cy0, cy1) = [
+            np.floor((np.array(lims)-bounds[2*i]) / (bounds[2*i+1]
+                     - bounds[2*i]) * self.n_cells).astype(np.int64)
+            for i, lims in enumerate([view[:2], view[2:]])]
+        return (max(cx0, 0), min(cx1, self.n_cells-1),
+                max(cy0, 0), min(cy1, self.n_cells-1))
+
+    def select(self, keys, cells):
+        cx0, cx1, cy0, cy1 = cells
+        rows = np.arange(cy0, cy1+1)*self.n_cells
+        starts = np.searchsorted(keys, rows+cx0, side="left")
+        ends = np.searchsorted(keys, rows+cx1, side="right")
+        return starts, ends
+
+class InteractiveGlyphs:
+    """
+    Keeps the glyphs on an axes in step with its view. When the axes
+    limits change (after a short debounce), the glyphs are removed and
+    only those in view, including any partly in view at its edges, are
+    drawn again. If more than max_glyphs points
+    are in view, nearby points are aggregated into a single glyph
+    showing their mean position, values and size, using the finest
+    level of detail grid that keeps the number of glyphs within
+    max_glyphs. Redraw cost therefore depends on max_glyphs rather
+    than on the size of the data.
+
+    Points must be given in the axes' native coordinates.
+    """
+    def __init__(self, ax, x_values, y_values, colour_values, shape_values,
+                 size_values, colormap, colour_mapping, shape_scale,
+                 frequency_scale, shape, shape_pos, shape_neg, scale_diverges,
+                 interval_type, max_glyphs=1000, debounce=0.15,
+                 rasterized=False):
+        self.ax = ax
+        self.colormap = colormap
+        self.colour_mapping = colour_mapping
+        self.shape_scale = shape_scale
+        self.frequency_scale = frequency_scale
+        self.shape = shape
+        self.shape_pos = shape_pos
+        self.shape_neg = shape_neg
+        self.scale_diverges = scale_diverges
+        self.interval_type = interval_type
+        self.max_glyphs = max_glyphs
+        self.rasterized = rasterized
+        self.artists = []
+
+        x, y, colour, shape_values, size = [np.asarray(v, dtype=float)
+                                            for v in (x_values, y_values,
+                                                      colour_values,
+                                                      shape_values,
+                                                      size_values)]
+        # pad so that points on the upper bounds fall inside the grid
+        pad_x = max(np.ptp(x), 1e-9) * 1e-6
+        pad_y = max(np.ptp(y), 1e-9) * 1e-6
+        self.bounds = [x.min()-pad_x, x.max()+pad_x,
+                       y.min()-pad_y, y.max()+pad_y]
+
+        n_levels = min(max_level, int(np.ceil(np.log(max(len(x), 1))
+                                              / np.log(4))))
+        self.levels = [_Level(level, x, y, colour, shape_values, size,
+                              self.bounds) for level in range(n_levels+1)]
+        # individual points, sorted by their cell in the finest level
+        finest = self.levels[-1]
+        cx, cy = finest.cell(x, y, self.bounds)
+        keys = cy*finest.n_cells + cx
+        order = np.argsort(keys, kind="stable")
+        self.point_keys = keys[order]
+        self.points = [v[order] for v in (x, y, colour, shape_values, size)]
+        # glyphs centred just outside the view still show within it
+        self.max_size = np.nanmax(size) if len(size) else 0
+
+        self.timer = ax.figure.canvas.new_timer(interval=int(debounce*1000))
+        self.timer.single_shot = True
+        self.timer.add_callback(self.update)
+
+    def connect(self):
+        def limits_changed(ax):
+            # restart the timer so only the last change triggers a redraw
+            self.timer.stop()
+            self.timer.start()
+        self.ax.callbacks.connect("xlim_changed", limits_changed)
+        self.ax.callbacks.connect("ylim_changed", limits_changed)
+        self.update()
+
+    def visible(self):
+        """
+        Returns x, y, colour, shape and size values of the glyphs to
+        draw for the current view, aggregated if needed.
+        """
+        xlim = sorted(self.ax.get_xlim())
+        ylim = sorted(self.ax.get_ylim())
+        # widen the view by the largest glyph radius, in data units
+        box = self.ax.get_window_extent()
+        radius = self.max_size/2 * self.ax.figure.dpi/72
+        pad_x = radius * (xlim[1]-xlim[0]) / max(box.width, 1)
+        pad_y = radius * (ylim[1]-ylim[0]) / max(box.height, 1)
+        view = [xlim[0]-pad_x, xlim[1]+pad_x, ylim[0]-pad_y, ylim[1]+pad_y]
+        if (view[1] < self.bounds[0] or view[0] > self.bounds[1]
+                or view[3] < self.bounds[2] or view[2] > self.bounds[3]):
+            return [np.empty(0)]*5
+
+        finest = self.levels[-1]
+        starts, ends = finest.select(self.point_keys,
+                                     finest.view_cells(view, self.bounds))
+        if (ends-starts).sum() <= self.max_glyphs:
+            index = np.concatenate([np.arange(s, e)
+                                    for s, e in zip(starts, ends)])
+            return [v[index] for v in self.points]
+
+        for level in reversed(self.levels):
+            cells = level.view_cells(view, self.bounds)
+            if (cells[1]-cells[0]+1)*(cells[3]-cells[2]+1) <= self.max_glyphs:
+                break
+        starts, ends = level.select(level.keys, cells)
+        index = np.concatenate([np.arange(s, e)
+                                for s, e in zip(starts, ends)])
+        return [v[index] for v in level.values]
+
+    def update(self):
+        for artist in self.artists:
+            artist.remove()
+        x, y, colour, shape_values, size = self.visible()
+        table = GlyphTable.from_values(x, y, colour, shape_values, size, 
+                                       self.colormap, self.colour_mapping, 
+                                       self.shape_scale, self.frequency_scale,
+                                       self.shape, self.shape_pos, 
+                                       self.shape_neg, self.scale_diverges,
+                                       self.interval_type)
+        self.artists = draw_glyph_table(self.ax, table)
+        for artist in self.artists:
+            artist.set_rasterized(self.rasterized)
+        self.ax.figure.canvas.draw_idle()
@@ -0,0 +1,188 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.spatial import cKDTree
+from .vizent_plot import glyph_spacing
+
+methods = ["idw", "nearest"]
+
+# the KD-tree and station values of a worker process, sent once when the
+# worker starts rather than with every batch
+_worker_stations = None
+
+def grid_centres(low, high, spacing):
+    # centres of equal cells filling [low, high], at least spacing apart
+    n_cells = max(1, int(np.floor(abs(high-low) / spacing)))
+    return low + (np.arange(n_cells) + 0.5) * (high-low) / n_cells
+
+def _init_worker(tree, values):
+    global _worker_stations
+    _worker_stations = (tree, values)
+
+def _estimate_in_worker(job):
+    return _estimate(job, *_worker_stations)
+
+def _estimate(job, tree, values):
+    """
+    Estimates values at a batch of grid points from their k nearest
+    stations. Returns the estimates, one column per field, with NaN
+    where no station is within max_distance.
+    """
+    points, method, k, power, max_distance, workers = job
+    distances, index = tree.query(points, k=k, workers=workers,
+                                  distance_upper_bound=max_distance)
+    if k == 1:
+        distances = distances[:, np.newaxis]
+        index = index[:, np.newaxis]
+    # missing neighbours have infinite distance and index len(values)
+    found = np.isfinite(distances)
+    neighbours = values[np.minimum(index, len(values)-1)]
+    if method == "idw":
+        with np.errstate(divide="ignore"):
+            weights = np.where(found, 1 / distances**power, 0)
+        # a grid point on a station takes that station's values
+        exact = distances[:, 0] == 0
+        weights[exact] = 0
+        weights[exact, 0] = 1
+    else:
+        weights = found.astype(float)
+    with np.errstate(invalid="ignore"):
+        return (np.einsum("pk,pkv->pv", weights, neighbours)
+                / weights.sum(axis=1)[:, np.newaxis])
+
+def interpolate_to_grid(x_values, y_values, colour_values, shape_values,
+                        extent=None, size=20, scale_x=None, scale_y=None,
+                        show_legend=True, use_cartopy=False, use_image=False,
+                        method="idw", k=8, power=2, max_distance=None,
+                        processes=None, batch_size=65536, **plot_params):
+    """
+    Interpolates colour and shape values measured at scattered
+    stations onto a regular grid, for plotting as evenly spaced
+    glyphs. The grid spacing is measured on a figure laid out with
+    the given vizent_plot options, so that glyphs of the given size
+    do not overlap when the grid is plotted with the same options.
+    Without an extent, the spacing allows for the margins vizent_plot
+    adds around the points. A KD-tree is built
+    over the stations once and every grid point is estimated from its
+    k nearest stations, in vectorised batches. x and y distances are
+    treated as equal, so use projected coordinates (e.g. eastings and
+    northings) where that matters.
+
+    Parameters:
+        x_values (list of floats): list of station x coordinates
+        y_values (list of floats): list of station y coordinates
+        colour_values (list of floats): list of values to be
+                                        represented by colour
+        shape_values (list of floats): list of values to be
+                                       represented by shape
+        extent (list of floats): Optional. [xmin, xmax, ymin,
+                                 ymax] of the grid. Defaults to
+                                 the extent of the stations.
+        size (float): Optional. Diameter of glyphs in points.
+        method (str): Optional. "idw" to weight the k nearest
+                      stations by inverse distance, or "nearest"
+                      to take their mean. Use "nearest" with k=1
+                      for the value of the nearest station.
+        k (int): Optional. Number of nearest stations used for
+                 each grid point.
+        power (float): Optional. With "idw", the power of
+                       distance that weights are inversely
+                       proportional to.
+        max_distance (float): Optional. Only use stations within
+                              this distance. Grid points with no
+                              station within it are dropped.
+        processes (int): Optional. Number of worker processes to
+                         estimate batches in. By default batches
+                         are estimated in this process, with the
+                         KD-tree queried using all cores.
+        batch_size (int): Optional. Number of grid points
+                          estimated at a time.
+        scale_x, scale_y, show_legend, use_cartopy, use_image: as
+                    for vizent_plot
+        plot_params: Optional. Other vizent_plot parameters the
+                     grid will be plotted with that affect the
+                     layout, e.g. title, image_type or show_axes.
+
+    Returns:
+        x, y, colour and shape values of the grid points as numpy
+        arrays
+
+    Example:
+        x, y, colour, shape = interpolate_to_grid(eastings, northings,
+                                                  temperature, variance,
+                                                  size=15)
+        vizent_plot(x, y, colour, shape, [15]*len(x))
+    """
+    if not (len(x_values) == len(y_values) == len(colour_values)
+            == len(shape_values)):
+        raise ValueError("x_values, y_values, colour_values and shape_values "
+                         "must all be of the same length")
+    if not method in methods:
+        raise ValueError("'{0}' is not a supported interpolation method. "
+                         "Choose from {1}".format(method, methods))
+    stations = np.column_stack([np.asarray(x_values, dtype=float),
+                                np.asarray(y_values, dtype=float)])
+    values = np.column_stack([np.asarray(colour_values, dtype=float),
+                              np.asarray(shape_values, dtype=float)])
+    valid = np.isfinite(stations).all(axis=1) & np.isfinite(values).all(axis=1)
+    stations = stations[valid]
+    values = values[valid]
+    if not len(stations) > 0:
+        raise ValueError("No stations with valid coordinates and values")
+
+    plot_extent = extent
+    if extent is None:
+        extent = [stations[:, 0].min(), stations[:, 0].max(),
+                  stations[:, 1].min(), stations[:, 1].max()]
+    elif len(extent) != 4:
+        raise ValueError("invalid extent. Extent should be formatted as "
+                         "[minimum_x, maximum_x, minimum_y, maximum_y].")
+    if plot_extent is not None:
+        plot_extent = list(plot_extent)
+    spacing_x, spacing_y = glyph_spacing(extent, size, extent=plot_extent,
+                                         scale_x=scale_x, scale_y=scale_y,
+                                         show_legend=show_legend,
+                                         use_cartopy=use_cartopy,
+                                         use_image=use_image, **plot_params)
+    if spacing_x == 0 or spacing_y == 0:
+        # stations on a line or a point; use the other direction's spacing
+        spacing_x = spacing_y = max(spacing_x, spacing_y, 1e-9)
+    grid_x, grid_y = np.meshgrid(grid_centres(extent[0], extent[1],
+                                              spacing_x),
+                                 grid_centres(extent[2], extent[3],
+                                              spacing_y))
+    points = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+
+    tree = cKDTree(stations)
+    k = min(k, len(stations))
+    if max_distance is None:
+        max_distance = np.inf
+    workers = -1 if processes is None or processes == 1 else 1
+    jobs = ((points[start:start+batch_size], method, k, power, max_distance,
+             workers) for start in range(0, len(points), batch_size))
+    if processes is None or processes == 1:
+        estimates = [_estimate(job, tree, values) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=_init_worker,
+                                 initargs=(tree, values)) as executor:
+            estimates = list(executor.map(_estimate_in_worker, jobs))
+    estimates = np.concatenate(estimates)
+
+    present = np.isfinite(estimates).all(axis=1)
+    return (points[present, 0], points[present, 1],
+            estimates[present, 0], estimates[present, 1])
@@ -0,0 +1,264 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+from collections import deque
+import numpy as np
+from .glyph_shapes import shapes
+from .scales import ScaleSummary, get_scales
+from .glyph_table import GlyphTable, draw_glyph_table
+from .vizent_plot import add_legend
+
+class _WindowExtreme:
+    """
+    Minimum or maximum of a sliding window of values, kept in a
+    monotonic deque of (sequence number, value). Each value is added
+    and removed at most once, so updates take amortised constant time
+    per value. Non-finite values are ignored.
+    """
+    def __init__(self, largest):
+        self.largest = largest
+        self.values = deque()
+
+    def extend(self, start, values):
+        finite = np.nonzero(np.isfinite(values))[0]
+        seqs = start + finite
+        values = values[finite]
+        if len(values) == 0:
+            return
+        # only values not beaten by a later value of the batch can ever
+        # be the extreme of the window
+        flipped = -values if self.largest else values
+        later_best = np.minimum.accumulate(flipped[::-1])[::-1]
+        keep = np.append(flipped[:-1] < later_best[1:], True)
+        seqs = seqs[keep]
+        values = values[keep]
+        best = values[0]
+        while self.values and (self.values[-1][1] <= best if self.largest
+                               else self.values[-1][1] >= best):
+            self.values.pop()
+        self.values.extend(zip(seqs.tolist(), values.tolist()))
+
+    def expire(self, start):
+        # drop values with sequence numbers before start
+        while self.values and self.values[0][0] < start:
+            self.values.popleft()
+
+    def value(self):
+        return self.values[0][1] if self.values else None
+
+def _window_summary(low, high, count):
+    min_val = low.value()
+    max_val = high.value()
+    if min_val is None:
+        return ScaleSummary()
+    return ScaleSummary(min_val, max_val, max(abs(min_val), abs(max_val)),
+                        min_val < 0, max_val > 0, count)
+
+class WindowedGlyphs:
+    """
+    Glyphs for a sliding window over a live feed of readings. Points
+    are appended as they arrive and expired once they are older than
+    the window. The windowed minimum and maximum of the colour and
+    shape values are maintained incrementally, so updating the scales
+    costs time proportional to the points added or expired rather than
+    to the window. Only new points are classified into glyphs, unless
+    the rounded scales changed, in which case the window is
+    reclassified.
+
+    Parameters are as for vizent_plot: colormap, scale_diverges,
+    shape, shape_pos, shape_neg, colour_max, colour_min, colour_n,
+    colour_spread, shape_max, shape_min, shape_n, shape_spread,
+    scale_dp and interval_type.
+
+    Example:
+        window = WindowedGlyphs(colormap="metoffice")
+        fig, (ax, ax_legend) = plt.subplots(1, 2, width_ratios=[2, 1])
+        while True:
+            times, x, y, temperature, variance = read_feed()
+            window.append(times, x, y, temperature, variance, 20)
+            window.expire(times[-1] - 600)
+            window.draw(ax, ax_legend)
+            plt.pause(1)
+    """
+    def __init__(self, colormap="viridis", scale_diverges=None, shape="sine",
+                 shape_pos="sine", shape_neg="square", colour_max=None,
+                 colour_min=None, colour_n=None, colour_spread=None,
+                 shape_max=None, shape_min=None, shape_n=None,
+                 shape_spread=None, scale_dp=1, interval_type="closest"):
+        for name in [shape, shape_pos, shape_neg]:
+            if not name in shapes:
+                raise ValueError("'{0}' is not a supported shape.".format(name))
+        self.colormap = colormap
+        self.scale_diverges = scale_diverges
+        self.shape = shape
+        self.shape_pos = shape_pos
+        self.shape_neg = shape_neg
+        self.scale_params = [colour_max, colour_min, colour_n, colour_spread,
+                             shape_max, shape_min, shape_n, shape_spread,
+                             scale_dp]
+        self.interval_type = interval_type
+        # sequence numbers of the first point in the window and of the
+        # next point to arrive
+        self.start = 0
+        self.end = 0
+        # the window's points, in batches as appended, each with its
+        # arrival times and glyph table
+        self.batches = deque()
+        self.colour_min = _WindowExtreme(largest=False)
+        self.colour_max = _WindowExtreme(largest=True)
+        self.shape_min = _WindowExtreme(largest=False)
+        self.shape_max = _WindowExtreme(largest=True)
+        # (scale_diverges, colour_scale, colour_mapping, shape_scale,
+        # frequency_scale) as from get_scales, or None for no points
+        self.scales = None
+        self.artists = []
+        self.legend_scales = None
+
+    def __len__(self):
+        return self.end - self.start
+
+    def colour_summary(self):
+        return _window_summary(self.colour_min, self.colour_max, len(self))
+
+    def shape_summary(self):
+        return _window_summary(self.shape_min, self.shape_max, len(self))
+
+    def append(self, times, x_values, y_values, colour_values, shape_values,
+               size_values):
+        """
+        Adds newly arrived points to the window. times must not be
+        earlier than those of points already appended. size_values may
+        be a single diameter for all points. Returns True if the
+        rounded scales changed.
+        """
+        times = np.asarray(times, dtype=float)
+        colour_values = np.asarray(colour_values, dtype=float)
+        shape_values = np.asarray(shape_values, dtype=float)
+        n = len(times)
+        if not (len(x_values) == len(y_values) == len(colour_values)
+                == len(shape_values) == n):
+            raise ValueError("times, x_values, y_values, colour_values and "
+                             "shape_values must all be of the same length")
+        if n == 0:
+            return False
+        if ((np.diff(times) < 0).any() or
+                (self.batches and times[0] < self.batches[-1]["times"][-1])):
+            raise ValueError("Points must be appended in order of time")
+        size_values = np.broadcast_to(np.asarray(size_values, dtype=float),
+                                      (n,))
+
+        self.colour_min.extend(self.end, colour_values)
+        self.colour_max.extend(self.end, colour_values)
+        self.shape_min.extend(self.end, shape_values)
+        self.shape_max.extend(self.end, shape_values)
+        self.end += n
+        batch = {"times": times, "x": np.asarray(x_values, dtype=float), 
+                 "y": np.asarray(y_values, dtype=float),
+                 "colour": colour_values, "shape": shape_values,
+                 "size": size_values, "table": None}
+        self.batches.append(batch)
+        changed = self._update_scales()
+        if not changed and self.scales is not None:
+            batch["table"] = self._classify(batch)
+        return changed
+
+    def expire(self, before):
+        """
+        Removes points that arrived before the given time. Returns
+        True if the rounded scales changed.
+        """
+        while self.batches:
+            batch = self.batches[0]
+            n_old = int(np.searchsorted(batch["times"], before, side="left"))
+            if n_old == 0:
+                break
+            self.start += n_old
+            if n_old == len(batch["times"]):
+                self.batches.popleft()
+            else:
+                for key in ["times", "x", "y", "colour", "shape", "size"]:
+                    batch[key] = batch[key][n_old:]
+                if batch["table"] is not None:
+                    batch["table"] = batch["table"].take(slice(n_old, None))
+        for extreme in [self.colour_min, self.colour_max, self.shape_min,
+                        self.shape_max]:
+            extreme.expire(self.start)
+        return self._update_scales()
+
+    def table(self):
+        """
+        Returns a GlyphTable of the points in the window.
+        """
+        if self.scales is None:
+            return GlyphTable(*[np.empty(0)]*6, [], np.empty((0, 4)))
+        return GlyphTable.concatenate([batch["table"]
+                                       for batch in self.batches])
+
+    def draw(self, ax, legend_ax=None, colour_label="temperature",
+             shape_label="variance"):
+        """
+        Replaces the glyphs previously drawn on ax with those of the
+        window, in ax's data coordinates. If legend_ax is given, the
+        legend is drawn on it whenever the scales have changed.
+        Returns the glyph collections.
+        """
+        for artist in self.artists:
+            artist.remove()
+        self.artists = draw_glyph_table(ax, self.table())
+        if (legend_ax is not None and self.scales is not None
+                and self.legend_scales is not self.scales):
+            legend_ax.clear()
+            (scale_diverges, colour_scale, colour_mapping, shape_scale,
+             frequency_scale) = self.scales
+            scale_x, scale_y = ax.figure.get_size_inches()
+            add_legend(legend_ax, colour_scale, self.colormap, colour_mapping,
+                       shape_scale, frequency_scale, self.shape,
+                       self.shape_pos, self.shape_neg, scale_diverges,
+                       scale_x, scale_y, colour_label, shape_label)
+            self.legend_scales = self.scales
+        ax.figure.canvas.draw_idle()
+        return self.artists
+
+    def _update_scales(self):
+        # recalculates the scales from the window summaries, and
+        # reclassifies the window if the rounded scales changed
+        colour_summary = self.colour_summary()
+        shape_summary = self.shape_summary()
+        if colour_summary.count == 0 or shape_summary.count == 0:
+            changed = self.scales is not None
+            self.scales = None
+            return changed
+        scales = get_scales(colour_summary, shape_summary, self.colormap,
+                            self.scale_diverges, *self.scale_params)
+        if self.scales is not None and (
+                [scales[0], scales[1], scales[3], scales[4]]
+                == [self.scales[0], self.scales[1], self.scales[3],
+                    self.scales[4]]):
+            return False
+        self.scales = scales
+        for batch in self.batches:
+            batch["table"] = self._classify(batch)
+        return True
+
+    def _classify(self, batch):
+        (scale_diverges, colour_scale, colour_mapping, shape_scale,
+         frequency_scale) = self.scales
+        return GlyphTable.from_values(batch["x"], batch["y"], batch["colour"],
+                                      batch["shape"], batch["size"],
+                                      self.colormap, colour_mapping,
+                                      shape_scale, frequency_scale,
+                                      self.shape, self.shape_pos,
+                                      self.shape_neg, scale_diverges,
+                                      self.interval_type)
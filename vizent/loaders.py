@@ -0,0 +1,185 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+import os
+import numpy as np
+
+file_formats = {".parquet": "parquet",
+                ".pq": "parquet",
+                ".csv": "csv",
+                ".nc": "netcdf",
+                ".nc4": "netcdf",
+                ".netcdf": "netcdf"}
+
+def get_file_format(path):
+    if os.path.isdir(path):
+        # a directory is read as a partitioned parquet dataset
+        return "parquet"
+    name = path.lower()
+    if name.endswith(".gz") or name.endswith(".bz2"):
+        name = os.path.splitext(name)[0]
+    try:
+        return file_formats[os.path.splitext(name)[1]]
+    except KeyError:
+        raise ValueError("Could not determine the format of '{0}'. Specify "
+                         "file_format as 'parquet', 'csv' or "
+                         "'netcdf'".format(path))
+
+def _arrow_batches(path, file_format, columns, x, y, extent, batch_size):
+    try:
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+    except ImportError:
+        raise ImportError("pyarrow is required to load {0} files. Install it "
+                          "with 'pip install pyarrow'".format(file_format))
+    # memory-map local files rather than reading them into buffers
+    dataset = ds.dataset(path, format=file_format,
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    row_filter = None
+    if extent is not None:
+        # pushed down to skip parquet row groups outside the extent
+        row_filter = ((ds.field(x) >= extent[0]) & (ds.field(x) <= extent[1])
+                      & (ds.field(y) >= extent[2]) & (ds.field(y) <= extent[3]))
+    scanner = dataset.scanner(columns=columns, filter=row_filter,
+                              batch_size=batch_size)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield {name: batch.column(name).to_numpy(zero_copy_only=False)
+                   for name in columns}
+
+def _netcdf_batches(path, columns, x, y, extent, batch_size):
+    try:
+        import xarray as xr
+    except ImportError:
+        raise ImportError("xarray is required to load NetCDF files. Install "
+                          "it with 'pip install xarray netCDF4'")
+    with xr.open_dataset(path) as dataset:
+        dataset = dataset[[name for name in columns
+                           if name in dataset.data_vars]]
+        dim = dataset[x].dims[0]
+        for start in range(0, dataset.sizes[dim], batch_size):
+            rows = dataset.isel({dim: slice(start, start+batch_size)})
+            if extent is not None:
+                # only x and y are read for batches outside the extent
+                x_values = rows[x].values
+                y_values = rows[y].values
+                inside = np.nonzero((x_values >= extent[0])
+                                    & (x_values <= extent[1])
+                                    & (y_values >= extent[2])
+                                    & (y_values <= extent[3]))[0]
+                if len(inside) == 0:
+                    continue
+                # the span of rows inside is read contiguously, which is
+                # much faster than indexing the file point by point
+                span = rows.isel({dim: slice(inside[0], inside[-1]+1)})
+                yield {name: span[name].values[inside-inside[0]]
+                       for name in columns}
+            else:
+                yield {name: rows[name].values for name in columns}
+
+def iter_point_batches(path, x="x", y="y", colour="colour", shape="shape",
+                       size="size", extent=None, file_format=None,
+                       batch_size=65536):
+    """
+    Streams the points in a Parquet, CSV or NetCDF file as batches.
+    Only the x, y, colour, shape and size columns are read, and rows
+    outside the extent are filtered out as the file is scanned. Each
+    batch is a dict of numpy arrays with keys "x", "y", "colour",
+    "shape" and "size". Rows with missing or non-finite values are
+    dropped.
+
+    Parameters are as for load_points, plus:
+        batch_size (int): Optional. Maximum number of rows read
+                          at a time.
+    """
+    if file_format is None:
+        file_format = get_file_format(path)
+    if extent is not None and len(extent) != 4:
+        raise ValueError("invalid extent. Extent should be formatted as "
+                         "[minimum_x, maximum_x, minimum_y, maximum_y].")
+    fields = {"x": x, "y": y, "colour": colour, "shape": shape}
+    if not isinstance(size, (int, float)):
+        fields["size"] = size
+    columns = list(dict.fromkeys(fields.values()))
+
+    if file_format in ("parquet", "csv"):
+        batches = _arrow_batches(path, file_format, columns, x, y, extent,
+                                 batch_size)
+    elif file_format == "netcdf":
+        batches = _netcdf_batches(path, columns, x, y, extent, batch_size)
+    else:
+        raise ValueError("Unsupported file format '{0}'. Choose from "
+                         "'parquet', 'csv' or 'netcdf'".format(file_format))
+
+    for batch in batches:
+        batch = {key: np.asarray(batch[name], dtype=float)
+                 for key, name in fields.items()}
+        valid = np.logical_and.reduce([np.isfinite(values)
+                                       for values in batch.values()])
+        if not valid.all():
+            batch = {key: values[valid] for key, values in batch.items()}
+        if "size" not in batch:
+            batch["size"] = np.full(len(batch["x"]), float(size))
+        if len(batch["x"]):
+            yield batch
+
+def load_points(path, x="x", y="y", colour="colour", shape="shape",
+                size="size", extent=None, file_format=None,
+                batch_size=65536):
+    """
+    Loads the points in a Parquet, CSV or NetCDF file as numpy arrays
+    that can be passed straight to vizent_plot. Only the five columns
+    needed are read. When an extent is given, rows outside it are
+    filtered out while the file is scanned (for Parquet, row groups
+    outside the extent are skipped using their statistics) so the
+    whole file is never held in memory. Local files are memory-mapped
+    where the format allows.
+
+    Parameters:
+        path (str): Path of the file. A directory is read as a
+                    partitioned Parquet dataset.
+        x (str): Optional. Name of the x coordinate column.
+        y (str): Optional. Name of the y coordinate column.
+        colour (str): Optional. Name of the column of values to
+                      be represented by colour.
+        shape (str): Optional. Name of the column of values to
+                     be represented by shape.
+        size (str or float): Optional. Name of the column of glyph
+                             diameters in points, or a single
+                             diameter for all glyphs.
+        extent (list of floats): Optional. Only load points
+                                 within [xmin, xmax, ymin, ymax].
+        file_format (str): Optional. "parquet", "csv" or
+                           "netcdf". Determined from the file
+                           extension if not given.
+
+    Returns:
+        x, y, colour, shape and size values as numpy arrays
+
+    Example:
+        x, y, colour, shape, size = load_points("stations.parquet",
+                                                x="long", y="lat",
+                                                colour="temp",
+                                                shape="variance",
+                                                size=20)
+        vizent_plot(x, y, colour, shape, size)
+    """
+    keys = ["x", "y", "colour", "shape", "size"]
+    batches = list(iter_point_batches(path, x, y, colour, shape, size,
+                                      extent, file_format, batch_size))
+    if not batches:
+        return tuple(np.empty(0) for key in keys)
+    return tuple(np.concatenate([batch[key] for batch in batches])
+                 for key in keys)
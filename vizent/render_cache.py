@@ -0,0 +1,293 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import matplotlib
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Colormap
+
+def _lazy_source(value):
+    # the file a lazily loaded (not dask backed) xarray field reads from,
+    # if it can be identified without loading it: by its path, size and
+    # modification time, with the variable name and all its coordinates
+    # identifying the part of the file
+    variable = getattr(value, "variable", None)
+    if variable is None or getattr(variable, "_in_memory", True):
+        return None
+    source = value.encoding.get("source")
+    if (not isinstance(source, str) or not os.path.exists(source)
+            or not all(dim in value.coords for dim in value.dims)):
+        return None
+    stat = os.stat(source)
+    return (os.path.abspath(source), stat.st_size, stat.st_mtime_ns,
+            str(value.name), value.shape, value.dtype.str)
+
+def _update_coords(digest, value):
+    # every coordinate of an xarray field, by name, including scalar
+    # coordinates left by selecting a single time or level
+    digest.update("coords:{0}".format(len(value.coords)).encode())
+    for name in sorted(value.coords, key=str):
+        _update_hash(digest, str(name))
+        _update_hash(digest, np.asarray(value.coords[name]))
+
+def _update_hash(digest, value):
+    # feeds a parameter value into the hash, tagged with its type so that
+    # e.g. 1 and "1" or [1, 2] and (1, 2) give different keys
+    if isinstance(value, (str, bytes, int, float, bool, type(None))):
+        digest.update(repr((type(value).__name__, value)).encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update("{0}:{1}".format(type(value).__name__,
+                                       len(value)).encode())
+        try:
+            array = np.asarray(value)
+        except ValueError:
+            array = None
+        if array is not None and array.dtype.kind in "biuf":
+            # numeric lists are hashed as arrays rather than by item
+            _update_hash(digest, array)
+        else:
+            for item in value:
+                _update_hash(digest, item)
+    elif isinstance(value, dict):
+        digest.update("dict:{0}".format(len(value)).encode())
+        for key in sorted(value, key=repr):
+            _update_hash(digest, key)
+            _update_hash(digest, value[key])
+    elif isinstance(value, Colormap):
+        _update_hash(digest, colormap_token(value))
+    elif hasattr(value, "data_vars"):
+        # an xarray Dataset, by its data variables
+        digest.update("dataset:{0}".format(len(value.data_vars)).encode())
+        for name in sorted(value.data_vars, key=str):
+            _update_hash(digest, str(name))
+            _update_hash(digest, value[name])
+    elif hasattr(value, "dims") and getattr(value, "chunks", None):
+        # a lazy (dask backed) xarray field is identified by its dask
+        # name, a hash of the graph, and by its coordinates
+        digest.update("dask:{0}".format(value.data.name).encode())
+        _update_coords(digest, value)
+    elif _lazy_source(value) is not None:
+        _update_hash(digest, ("lazy",) + _lazy_source(value))
+        _update_coords(digest, value)
+    else:
+        array = np.ascontiguousarray(np.asarray(value))
+        if array.dtype == object:
+            digest.update(repr(array.tolist()).encode())
+        else:
+            digest.update("array:{0}:{1}".format(array.dtype.str,
+                                                 array.shape).encode())
+            digest.update(array.tobytes())
+            if hasattr(value, "coords"):
+                _update_coords(digest, value)
+
+def colormap_token(colormap):
+    """
+    Returns a value identifying the colours of a colormap, given as a
+    Colormap or the name of one, so that re-registering a name with
+    different colours gives a different render key. Invalid names are
+    identified as viridis, which is plotted in their place.
+    """
+    if colormap == "metoffice":
+        # the metoffice colours are part of the package
+        return colormap
+    try:
+        # resolved as get_colour_mapping does, including its fallback
+        colormap = ScalarMappable(cmap=colormap).get_cmap()
+    except ValueError:
+        colormap = matplotlib.colormaps["viridis"]
+    lut = colormap(np.linspace(0, 1, colormap.N))
+    return ("colormap", colormap.name, colormap.N, lut.tobytes(),
+            tuple(colormap.get_under()), tuple(colormap.get_over()),
+            tuple(colormap.get_bad()))
+
+def image_token(use_image, image_type, image_file):
+    """
+    Returns a value identifying a user's background image file by its
+    path, size and modification time. The included images are
+    identified by the package version.
+    """
+    if not use_image or image_type in ("newcastle", "england"):
+        return None
+    if isinstance(image_file, str) and os.path.exists(image_file):
+        stat = os.stat(image_file)
+        return (os.path.abspath(image_file), stat.st_size, stat.st_mtime_ns)
+    return image_file
+
+# rcParams that do not affect the rendered file
+rc_ignored = ("backend", "interactive", "keymap.", "toolbar", "webagg.",
+              "tk.", "macosx.", "animation.", "figure.raise_window",
+              "savefig.directory")
+
+def rc_token():
+    """
+    Returns a value identifying the matplotlib rcParams in effect
+    (style, fonts, etc.), so that renders made under different
+    settings, e.g. in processes sharing a cache directory, get
+    different render keys.
+    """
+    return tuple((name, repr(value))
+                 for name, value in sorted(matplotlib.rcParams.items())
+                 if not name.startswith(rc_ignored))
+
+def render_key(params, format, dpi):
+    """
+    Returns a hex digest identifying a render: a hash of the input
+    arrays, all plot parameters, the output format and resolution, the
+    vizent and matplotlib versions and rcParams and the colormap and
+    background image.
+
+    Parameters:
+        params (dict): vizent_figure parameters, by name.
+        format (str): Output file format.
+        dpi (float): Output resolution.
+    """
+    from . import __version__
+    digest = hashlib.sha256()
+    _update_hash(digest, ("vizent", __version__, "matplotlib",
+                          matplotlib.__version__, format, dpi))
+    for name in sorted(params):
+        _update_hash(digest, name)
+        _update_hash(digest, params[name])
+    _update_hash(digest, colormap_token(params.get("colormap", "viridis")))
+    _update_hash(digest, image_token(params.get("use_image"),
+                                     params.get("image_type"),
+                                     params.get("image_file")))
+    _update_hash(digest, rc_token())
+    return digest.hexdigest()
+
+class RenderCache:
+    """
+    Cache of rendered plots, keyed by render_key. Entries are kept in
+    memory and, if a directory is given, on disk, each bounded in
+    total size with the least recently used entries evicted first.
+    Files are written atomically, so several processes may share a
+    directory. Safe to use from several threads at once.
+
+    Parameters:
+        directory (str): Optional. Directory to keep rendered files
+                         in. If None, entries are only kept in
+                         memory.
+        max_memory (int): Optional. Maximum total size in bytes of
+                          the entries kept in memory. 0 disables the
+                          memory cache.
+        max_disk (int): Optional. Maximum total size in bytes of the
+                        files kept in directory.
+    """
+    def __init__(self, directory=None, max_memory=256*2**20,
+                 max_disk=2**30):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        # sizes of the files on disk, least recently used first
+        self.files = OrderedDict()
+        self.disk_size = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            entries = sorted((entry for entry in os.scandir(directory)
+                              if entry.is_file()
+                              and entry.name.endswith(".cache")),
+                             key=lambda entry: entry.stat().st_mtime)
+            for entry in entries:
+                self.files[entry.name[:-len(".cache")]] = entry.stat().st_size
+                self.disk_size += entry.stat().st_size
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".cache")
+
+    def get(self, key):
+        """
+        Returns the cached bytes for key, or None.
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+            if self.directory is None:
+                return None
+            try:
+                with open(self.path(key), "rb") as f:
+                    data = f.read()
+                # the modification time records use for eviction
+                os.utime(self.path(key))
+            except FileNotFoundError:
+                # evicted, possibly by another process
+                self._forget_file(key)
+                return None
+            self._forget_file(key)
+            self.files[key] = len(data)
+            self.disk_size += len(data)
+            self._remember(key, data)
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            self._remember(key, data)
+            if self.directory is None or len(data) > self.max_disk:
+                return
+            # write to a temporary file first so that readers never see
+            # a partial file
+            fd, temp_path = tempfile.mkstemp(dir=self.directory,
+                                             suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, self.path(key))
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            self._forget_file(key)
+            self.files[key] = len(data)
+            self.disk_size += len(data)
+            while self.disk_size > self.max_disk:
+                old_key, size = self.files.popitem(last=False)
+                self.disk_size -= size
+                try:
+                    os.remove(self.path(old_key))
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.memory_size = 0
+            for key in list(self.files):
+                try:
+                    os.remove(self.path(key))
+                except FileNotFoundError:
+                    pass
+            self.files.clear()
+            self.disk_size = 0
+
+    def _remember(self, key, data):
+        if key in self.memory:
+            self.memory_size -= len(self.memory.pop(key))
+        if len(data) > self.max_memory:
+            return
+        self.memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.max_memory:
+            self.memory_size -= len(self.memory.popitem(last=False)[1])
+
+    def _forget_file(self, key):
+        if key in self.files:
+            self.disk_size -= self.files.pop(key)
@@ -13,40 +13,129 @@ arXiv:1907.12879
 
 """
 
+from functools import reduce
 import numpy as np
 from .metofficelimits import *
 import matplotlib
 import matplotlib.cm as cm 
 
+class ScaleSummary:
+    """
+    Summary of a set of values holding everything needed to build the
+    colour and shape scales: the minimum, the maximum, the largest 
+    absolute value and whether negative or positive values are present. 
+
+    Summaries of separate partitions of the data can be merged in any 
+    order or grouping, and scales built from the merged summary are 
+    identical to scales built from the complete data. Summaries can be 
+    passed to the scale functions in place of the values, and can be 
+    pickled or converted to and from a dict for sending between 
+    processes.
+    """
+    def __init__(self, min=None, max=None, max_abs=None, has_negative=False, 
+                 has_positive=False, count=0):
+        self.min = min
+        self.max = max
+        self.max_abs = max_abs
+        self.has_negative = has_negative
+        self.has_positive = has_positive
+        self.count = count
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values)
+        if values.dtype.kind == "f":
+            # missing values are ignored, so one NaN does not make the
+            # whole summary NaN
+            values = values[np.isfinite(values)]
+        if values.size == 0:
+            return cls()
+        min_val = values.min().item()
+        max_val = values.max().item()
+        return cls(min_val, max_val, max(abs(min_val), abs(max_val)), 
+                   min_val < 0, max_val > 0, int(values.size))
+
+    def merge(self, other):
+        if self.count == 0:
+            return other
+        if other.count == 0:
+            return self
+        return ScaleSummary(min(self.min, other.min), max(self.max, other.max),
+                            max(self.max_abs, other.max_abs), 
+                            self.has_negative or other.has_negative,
+                            self.has_positive or other.has_positive,
+                            self.count + other.count)
+
+    __add__ = merge
+
+    def to_dict(self):
+        return {"min": self.min, "max": self.max, "max_abs": self.max_abs, 
+                "has_negative": self.has_negative, 
+                "has_positive": self.has_positive, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, summary):
+        return cls(**summary)
+
+    def __eq__(self, other):
+        return (isinstance(other, ScaleSummary) 
+                and self.to_dict() == other.to_dict())
+
+    def __repr__(self):
+        return "ScaleSummary({0})".format(", ".join(
+            "{0}={1!r}".format(k, v) for k, v in self.to_dict().items()))
+
+def summarise(values):
+    if isinstance(values, ScaleSummary):
+        return values
+    return ScaleSummary.from_values(values)
+
+def merge_summaries(summaries):
+    return reduce(ScaleSummary.merge, summaries, ScaleSummary())
+
+def summarise_partitions(partitions):
+    """
+    Summarises each partition of values in turn, in the current 
+    process, and merges the results into a single ScaleSummary. 
+    partitions may be a generator that loads one partition at a time, 
+    so the complete data is never held in memory. For data spread 
+    over several workers, summarise on each worker and send only the 
+    summaries (e.g. with to_dict) to be merged with merge_summaries.
+    """
+    return merge_summaries(map(summarise, partitions))
+
 def scale_is_negative(values):
-    return any(x<0 for x in values) and not any(x>0 for x in values)
+    summary = summarise(values)
+    return summary.has_negative and not summary.has_positive
 
 def scale_is_divergent(values):
-    return any(x<0 for x in values) and any(x>0 for x in values)
+    summary = summarise(values)
+    return summary.has_negative and summary.has_positive
 
 def get_colour_scale(values, max_val, min_val, n_colours, 
                      scale_spread, scale_dp):
+    summary = summarise(values)
     if scale_spread is not None and scale_spread < 0:
         scale_spread=abs(scale_spread)
     # Determine min and max scale values
     if max_val==None and min_val==None:
         if scale_spread == None:
-            min_val = min(values)
-            max_val = max(values)
+            min_val = summary.min
+            max_val = summary.max
             scale_spread = max_val - min_val
         else:
-            mid_point = (min(values)+max(values))/2
+            mid_point = (summary.min+summary.max)/2
             max_val = mid_point + (scale_spread/2)
             min_val = mid_point - (scale_spread/2)
     elif max_val==None:
         if scale_spread == None:
-            max_val = max(values)
+            max_val = summary.max
             scale_spread = max_val - min_val
         else:
             max_val = min_val + scale_spread
     elif min_val==None:
         if scale_spread == None:
-            min_val = min(values)
+            min_val = summary.min
             scale_spread = max_val - min_val
         else:
             min_val = max_val - scale_spread
@@ -56,7 +145,7 @@ def get_colour_scale(values, max_val, min_val, n_colours,
                              "maximum colour scale value")
         scale_spread = max_val - min_val
     # The user is warned if their specified values exclude data
-    if min_val > min(values) or max_val < max(values):
+    if min_val > summary.min or max_val < summary.max:
         print("Warning: specified minimum and maximum colour scale values "
               "or specified colour scale spread exclude some data")
     # Determine intermediate values
@@ -101,6 +190,7 @@ def get_colour(value, colormap, mapping):
 
 def get_shape_scale(values, max_val, min_val, n_shapes, scale_diverges, 
                     scale_spread, scale_dp):
+    summary = summarise(values)
     if scale_spread is not None and scale_spread < 0:
         scale_spread=abs(scale_spread)
     if n_shapes is not None and n_shapes > 7:
@@ -118,7 +208,7 @@ def get_shape_scale(values, max_val, min_val, n_shapes, scale_diverges,
         if max_val==None and min_val==None:
             if scale_spread == None:
                 scale_spread = 2
-                max_val = max(abs(max(values, key=abs)), scale_spread/2)
+                max_val = max(summary.max_abs, scale_spread/2)
                 min_val = max_val * -1
             else:
                 max_val = scale_spread/2
@@ -148,12 +238,12 @@ def get_shape_scale(values, max_val, min_val, n_shapes, scale_diverges,
             scale_vals.append(np.round(0+scale_spread
                                        *(i/(n_shapes-1)), scale_dp))
     # negative scale
-    elif scale_is_negative(values): 
+    elif scale_is_negative(summary): 
         if max_val==None and min_val==None:
             if scale_spread == None:
                 scale_spread = 1
-                max_val = max(max(values),0)
-                min_val = max(abs(max(values, key=abs)), scale_spread)*-1
+                max_val = max(summary.max,0)
+                min_val = max(summary.max_abs, scale_spread)*-1
             else:
                 max_val = 0
                 min_val = -scale_spread
@@ -164,9 +254,9 @@ def get_shape_scale(values, max_val, min_val, n_shapes, scale_diverges,
                 max_val = min_val + scale_spread
         elif min_val==None:
             if scale_spread == None:
-                min_val = min(values)
+                min_val = summary.min
             else:
-                min_val = max(max(values, key=abs), max_val-scale_spread, 
+                min_val = max(summary.min, max_val-scale_spread, 
                               key=abs)
         else:
             if min_val>=max_val:
@@ -181,19 +271,19 @@ def get_shape_scale(values, max_val, min_val, n_shapes, scale_diverges,
         if max_val==None and min_val==None:
             if scale_spread == None:
                 scale_spread = 1
-                max_val = max(abs(max(values, key=abs)), scale_spread)
-                min_val = min(min(values),0)
+                max_val = max(summary.max_abs, scale_spread)
+                min_val = min(summary.min,0)
             else:
                 max_val = scale_spread
                 min_val = 0
         elif max_val==None:
             if scale_spread == None:
-                max_val = max(abs(max(values, key=abs)), 1)
+                max_val = max(summary.max_abs, 1)
             else:
                 max_val = min_val + scale_spread
         elif min_val==None:
             if scale_spread == None:
-                min_val = min(min(values),0)
+                min_val = min(summary.min,0)
             else:
                 min_val = max_val - scale_spread
         else:
@@ -209,7 +299,7 @@ def get_shape_scale(values, max_val, min_val, n_shapes, scale_diverges,
                 scale_vals.append(np.round((min_val), scale_dp))
 
     # The user is warned if their specified values exclude data
-    if min_val > min(values) or max_val < max(values):
+    if min_val > summary.min or max_val < summary.max:
         print("Warning: specified minimum and maximum shape scale values "
               "or specified shape scale spread exclude some data")
     return scale_vals
@@ -246,8 +336,12 @@ def get_shape(value, shape=None, divergent=None, shape_pos=None,
         return shape
 
 def get_frequency(value, shape_scale, frequency_scale, interval_type):
+    return frequency_scale[get_frequency_index(value, shape_scale, 
+                                               interval_type)]
+
+def get_frequency_index(value, shape_scale, interval_type):
     if len(shape_scale) == 1:
-        return frequency_scale[0]
+        return 0
     if interval_type=="closest":
         i=0
         while value > shape_scale[i]:
@@ -271,4 +365,34 @@ def get_frequency(value, shape_scale, frequency_scale, interval_type):
         raise ValueError("The specified interval type for categorizing shapes "
                          "values does not exist. Choose from 'closest' or "
                          "'limit'")
-    return frequency_scale[i]
\ No newline at end of file
+    return i
+
+def get_scales(colour_values, shape_values, colormap, scale_diverges, 
+               colour_max, colour_min, colour_n, colour_spread, shape_max, 
+               shape_min, shape_n, shape_spread, scale_dp):
+    # values or summaries; each is summarised once for both scales
+    colour_values = summarise(colour_values)
+    shape_values = summarise(shape_values)
+    if scale_diverges == None:
+        scale_diverges = scale_is_divergent(shape_values)
+    
+    if colour_n == None:
+        if shape_n == None:
+            if scale_diverges:
+                colour_n = 7
+            else:
+                colour_n = 5
+        else:
+            if scale_diverges:
+                colour_n = (2*shape_n)-1
+            else:
+                colour_n = shape_n     
+
+    colour_scale = get_colour_scale(colour_values, colour_max, colour_min, 
+                                    colour_n, colour_spread, scale_dp)
+    colour_mapping = get_colour_mapping(colour_scale, colormap)
+    shape_scale = get_shape_scale(shape_values, shape_max, shape_min, shape_n, 
+                                  scale_diverges, shape_spread, scale_dp) 
+    frequency_scale = get_frequency_scale(shape_scale, scale_diverges)
+    return (scale_diverges, colour_scale, colour_mapping, shape_scale, 
+            frequency_scale)
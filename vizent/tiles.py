@@ -0,0 +1,270 @@
+"""
+Author: Lucy McLaughlin
+Date: 19/02/2021
+
+Acknowledgments:
+The Alan Turing Institute for funding the Newcastle Seedcorn project
+"Automating visualization", under the EPSRC grant EP/N510129/1 and for
+Nick Holliman's Turing Fellowship.
+
+Citation:
+"Visual Entropy and the Visualization of Uncertainty", Holliman et al,
+arXiv:1907.12879
+
+"""
+
+import io
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import cartopy.crs as ccrs
+from .glyph_shapes import shapes
+from .scales import *
+from .glyph_table import GlyphTable, draw_glyph_table
+from .vizent_plot import get_map_features
+
+# Web Mercator (EPSG:3857) constants
+tile_size = 256
+earth_radius = 6378137.0
+origin_shift = np.pi * earth_radius
+max_latitude = 85.0511287798
+# render at 72 dpi so that glyph sizes in points are sizes in pixels
+tile_dpi = 72
+
+def lonlat_to_mercator(lon, lat):
+    lon = np.asarray(lon, dtype=float)
+    lat = np.clip(np.asarray(lat, dtype=float), -max_latitude, max_latitude)
+    mx = np.radians(lon) * earth_radius
+    my = np.log(np.tan(np.pi/4 + np.radians(lat)/2)) * earth_radius
+    return mx, my
+
+def mercator_to_pixels(mx, my, zoom):
+    world_size = tile_size * (2**zoom)
+    px = (mx + origin_shift) / (2*origin_shift) * world_size
+    py = (origin_shift - my) / (2*origin_shift) * world_size
+    return px, py
+
+def tile_bounds(zoom, tile_x, tile_y):
+    tile_metres = 2*origin_shift / (2**zoom)
+    x_min = tile_x*tile_metres - origin_shift
+    y_max = origin_shift - tile_y*tile_metres
+    return [x_min, x_min + tile_metres, y_max - tile_metres, y_max]
+
+def select_tiles(px, py, radius, zoom):
+    """
+    Returns a dict mapping (tile_x, tile_y) to the indices of the
+    points whose glyphs (centre plus radius, in pixels) touch that
+    tile at the given zoom level. Tiles without glyphs are omitted.
+    """
+    n_tiles = 2**zoom
+    tx0 = np.clip(np.floor((px-radius)/tile_size), 0, n_tiles-1).astype(int)
+    tx1 = np.clip(np.floor((px+radius)/tile_size), 0, n_tiles-1).astype(int)
+    ty0 = np.clip(np.floor((py-radius)/tile_size), 0, n_tiles-1).astype(int)
+    ty1 = np.clip(np.floor((py+radius)/tile_size), 0, n_tiles-1).astype(int)
+
+    keys = []
+    indices = []
+    for dx in range(int((tx1-tx0).max())+1):
+        for dy in range(int((ty1-ty0).max())+1):
+            touching = np.nonzero((tx0+dx <= tx1) & (ty0+dy <= ty1))[0]
+            keys.append((tx0[touching]+dx)*n_tiles + ty0[touching]+dy)
+            indices.append(touching)
+    keys = np.concatenate(keys)
+    indices = np.concatenate(indices)
+
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    indices = indices[order]
+    unique_keys, starts = np.unique(keys, return_index=True)
+    groups = np.split(indices, starts[1:])
+    return {(int(k)//n_tiles, int(k)%n_tiles): np.sort(g)
+            for k, g in zip(unique_keys, groups)}
+
+def _render_tile(job):
+    zoom, tile_x, tile_y, table, use_cartopy = job
+    fig = Figure(figsize=(tile_size/tile_dpi, tile_size/tile_dpi),
+                 dpi=tile_dpi)
+    FigureCanvasAgg(fig)
+    fig.patch.set_alpha(0)
+    bounds = tile_bounds(zoom, tile_x, tile_y)
+    if use_cartopy:
+        ax = fig.add_axes([0, 0, 1, 1], projection=ccrs.Mercator.GOOGLE)
+        for feature in get_map_features():
+            ax.add_feature(feature)
+        ax.set_extent(bounds, crs=ccrs.Mercator.GOOGLE)
+    else:
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.patch.set_alpha(0)
+        ax.set_xlim(bounds[0], bounds[1])
+        ax.set_ylim(bounds[2], bounds[3])
+    ax.axis('off')
+    draw_glyph_table(ax, table)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=tile_dpi,
+                transparent=not use_cartopy)
+    return zoom, tile_x, tile_y, buffer.getvalue()
+
+class _DirectoryWriter:
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, zoom, tile_x, tile_y, data):
+        tile_dir = os.path.join(self.path, str(zoom), str(tile_x))
+        os.makedirs(tile_dir, exist_ok=True)
+        with open(os.path.join(tile_dir, "{0}.png".format(tile_y)),
+                  "wb") as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+class _MBTilesWriter:
+    def __init__(self, path, min_zoom, max_zoom, bounds):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS metadata "
+                                "(name TEXT, value TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS tiles "
+                                "(zoom_level INTEGER, tile_column INTEGER, "
+                                "tile_row INTEGER, tile_data BLOB)")
+        self.connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index "
+                                "ON tiles (zoom_level, tile_column, "
+                                "tile_row)")
+        metadata = {"name": "vizent", "type": "overlay", "version": "1.0",
+                    "description": "vizent glyph layer", "format": "png",
+                    "minzoom": str(min_zoom), "maxzoom": str(max_zoom),
+                    "bounds": ",".join(str(b) for b in bounds)}
+        self.connection.execute("DELETE FROM metadata")
+        self.connection.executemany("INSERT INTO metadata VALUES (?, ?)",
+                                    metadata.items())
+
+    def write(self, zoom, tile_x, tile_y, data):
+        # MBTiles uses TMS row numbering (origin at the bottom left)
+        tile_row = (2**zoom) - 1 - tile_y
+        self.connection.execute("INSERT OR REPLACE INTO tiles VALUES "
+                                "(?, ?, ?, ?)",
+                                (zoom, tile_x, tile_row,
+                                 sqlite3.Binary(data)))
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+def vizent_tiles(x_values, y_values, colour_values, shape_values, size_values,
+                 output, min_zoom=0, max_zoom=8, colormap="viridis",
+                 use_cartopy=False, scale_diverges=None, shape="sine",
+                 shape_pos="sine", shape_neg="square", colour_max=None,
+                 colour_min=None, colour_n=None, colour_spread=None,
+                 shape_max=None, shape_min=None, shape_n=None,
+                 shape_spread=None, scale_dp=1, interval_type="closest",
+                 processes=None):
+    """
+    Renders the glyph layer for the provided points into a z/x/y
+    Web Mercator tile pyramid for use on a web slippy map. Scales
+    are calculated once over all of the data, so that glyphs are
+    consistent across tiles and zoom levels. Tiles without any
+    glyphs are not written.
+
+    Parameters:
+        x_values (list of floats): list of longitudes
+        y_values (list of floats): list of latitudes
+        colour_values (list of floats): list of values to be
+                                        represented by colour
+        shape_values (list of floats): list of values to be
+                                       represented by shape
+        size_values (list of floats): list of values for
+                                      diameter of glyphs in
+                                      pixels.
+        output (str): Directory to write {z}/{x}/{y}.png tiles
+                      to, or path of an SQLite file ending in
+                      .mbtiles.
+        min_zoom (int): Optional. Lowest zoom level to render.
+        max_zoom (int): Optional. Highest zoom level to render.
+        use_cartopy (bool): Optional. Render glyphs over the
+                            Cartopy basemap. If False, tiles
+                            have a transparent background.
+        processes (int): Optional. Number of worker processes
+                         used to render tiles. Defaults to the
+                         number of cores. Use 1 to render in
+                         the current process.
+
+        colormap, scale_diverges, shape, shape_pos, shape_neg,
+        colour_max, colour_min, colour_n, colour_spread,
+        shape_max, shape_min, shape_n, shape_spread, scale_dp and
+        interval_type are as for vizent_plot.
+
+    Returns:
+        The number of tiles written.
+    """
+    if not (len(x_values) == len(y_values) == len(colour_values)
+            == len(shape_values) == len(size_values)):
+        raise ValueError("x_values, y_values, colour_values, shape_values and "
+                         "size_values must all be of the same length")
+    if not len(x_values) > 0:
+        raise ValueError("Empty input lists")
+    if min_zoom < 0 or max_zoom < min_zoom:
+        raise ValueError("zoom levels must satisfy 0 <= min_zoom <= max_zoom")
+    for name in [shape, shape_pos, shape_neg]:
+        if not name in shapes:
+            raise ValueError("'{0}' is not a supported shape.".format(name))
+
+    (scale_diverges, colour_scale, colour_mapping, shape_scale,
+     frequency_scale) = get_scales(colour_values, shape_values, colormap,
+                                   scale_diverges, colour_max, colour_min,
+                                   colour_n, colour_spread, shape_max,
+                                   shape_min, shape_n, shape_spread, scale_dp)
+    mx, my = lonlat_to_mercator(x_values, y_values)
+    table = GlyphTable.from_values(mx, my, colour_values, shape_values,
+                                   size_values, colormap, colour_mapping,
+                                   shape_scale, frequency_scale, shape,
+                                   shape_pos, shape_neg, scale_diverges,
+                                   interval_type)
+
+    def jobs():
+        for zoom in range(min_zoom, max_zoom+1):
+            px, py = mercator_to_pixels(mx, my, zoom)
+            for (tile_x, tile_y), idx in select_tiles(px, py, table.size/2,
+                                                      zoom).items():
+                bounds = tile_bounds(zoom, tile_x, tile_y)
+                # positions are relative to the tile's lower left corner,
+                # which float32 holds precisely at any zoom level
+                tile_table = table.take(idx)
+                tile_table.origin = (bounds[0], bounds[2])
+                tile_table.x = (mx[idx] - bounds[0]).astype(np.float32)
+                tile_table.y = (my[idx] - bounds[2]).astype(np.float32)
+                yield zoom, tile_x, tile_y, tile_table, use_cartopy
+
+    if output.lower().endswith(".mbtiles"):
+        bounds = [min(x_values), max(-max_latitude, min(y_values)),
+                  max(x_values), min(max_latitude, max(y_values))]
+        writer = _MBTilesWriter(output, min_zoom, max_zoom, bounds)
+    else:
+        writer = _DirectoryWriter(output)
+
+    n_written = 0
+    try:
+        if processes == 1:
+            for result in map(_render_tile, jobs()):
+                writer.write(*result)
+                n_written += 1
+        else:
+            # keep a bounded number of tiles in flight, so that tile
+            # tables are built just before they are rendered rather than
+            # all at once
+            max_pending = 4 * (processes or os.cpu_count() or 1)
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                for job in jobs():
+                    pending.append(executor.submit(_render_tile, job))
+                    if len(pending) >= max_pending:
+                        writer.write(*pending.popleft().result())
+                        n_written += 1
+                while pending:
+                    writer.write(*pending.popleft().result())
+                    n_written += 1
+    finally:
+        writer.close()
+    return n_written
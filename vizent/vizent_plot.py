@@ -15,27 +15,53 @@ arXiv:1907.12879
 
 """
 
+import io
+import os
+from functools import lru_cache
+from inspect import signature
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib import gridspec
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature 
 from .glyph_shapes import shapes, get_shape_points
 from .scales import * 
 from .background_image import get_image, add_image_background
+from .gridded import is_gridded, grid_to_points
+from .interactive import InteractiveGlyphs
+from .glyph_table import GlyphTable, draw_glyph_table
+from .render_cache import render_key
+
+# CRS instances are created once and shared, so that cartopy can reuse
+# its cached transforms between plots
+plate_carree = ccrs.PlateCarree()
+mercator = ccrs.Mercator()
+
+def is_numeric(values):
+    if isinstance(values, np.ndarray):
+        return np.issubdtype(values.dtype, np.number)
+    return all(isinstance(i, (int, float, np.number)) for i in values)
+
+def padded_extent(x_values, y_values):
+    pad = (max(np.max(x_values)-np.min(x_values), 
+               np.max(y_values)-np.min(y_values)))/10
+    return [np.min(x_values)-pad, np.max(x_values)+pad, 
+            np.min(y_values)-pad, np.max(y_values)+pad]
 
 def add_point(x, y, shape, frequency, colour, size, ax, use_cartopy=False):
     shape_points = get_shape_points(shape,frequency)
     if use_cartopy:
         # add outer circle
         ax.scatter(x, y, marker='o', s=(size)**2, facecolor="black", 
-                   linewidths=0, transform=ccrs.PlateCarree(), zorder=100)
+                   linewidths=0, transform=plate_carree, zorder=100)
         # add shape
         ax.scatter(x, y, marker=shape_points, 
                    s=(size*(np.abs(shape_points).max()))**2,facecolor="white", 
-                   linewidths=0, transform=ccrs.PlateCarree(), zorder=101)
+                   linewidths=0, transform=plate_carree, zorder=101)
         # add inner circle
         ax.scatter(x, y, marker='o', s=(size*0.6)**2, facecolor=colour, 
-                   linewidths=0, transform=ccrs.PlateCarree(), zorder=102) 
+                   linewidths=0, transform=plate_carree, zorder=102) 
     else:
         # add outer circle
         ax.scatter(x, y, marker='o', s=(size)**2, facecolor="black", 
@@ -48,6 +74,75 @@ def add_point(x, y, shape, frequency, colour, size, ax, use_cartopy=False):
         ax.scatter(x, y, marker='o', s=(size*0.6)**2, facecolor=colour, 
                    linewidths=0) 
 
+def add_points(ax, x_values, y_values, colour_values, shape_values, 
+               size_values, colormap, colour_mapping, shape_scale, 
+               frequency_scale, shape, shape_pos, shape_neg, scale_diverges, 
+               interval_type, use_cartopy=False):
+    if use_cartopy:
+        x_values, y_values = project_points(ax, x_values, y_values)
+    table = GlyphTable.from_values(x_values, y_values, colour_values, 
+                                   shape_values, size_values, colormap, 
+                                   colour_mapping, shape_scale, 
+                                   frequency_scale, shape, shape_pos, 
+                                   shape_neg, scale_diverges, interval_type)
+    if use_cartopy:
+        return draw_glyph_table(ax, table, zorder=100)
+    return draw_glyph_table(ax, table)
+
+def project_points(ax, x_values, y_values):
+    """
+    Projects longitudes and latitudes into the native coordinates of a 
+    cartopy axes with a single vectorised call, so that glyphs can be
+    drawn without a per-artist PlateCarree transform.
+    """
+    projected = ax.projection.transform_points(
+        plate_carree, np.asarray(x_values, dtype=float),
+        np.asarray(y_values, dtype=float))
+    return projected[:, 0], projected[:, 1]
+
+@lru_cache(maxsize=32)
+def get_map_features(extent=None):
+    # Natural Earth features are created once and shared between maps. 
+    # With an extent, their geometries are also clipped once and shared
+    # between all maps with that extent. Only the most recently used
+    # extents are kept, as each holds its own copy of the geometries.
+    if extent is None:
+        coastline = cfeature.NaturalEarthFeature('physical', 'coastline', 
+                                                 '50m', edgecolor='black', 
+                                                 facecolor='none', zorder=0)
+        ocean = cfeature.NaturalEarthFeature('physical', 'ocean', '50m', 
+                                             edgecolor='face', 
+                                             facecolor='#B3CFDD', zorder=-1)
+        land = cfeature.NaturalEarthFeature('physical', 'land', '50m',
+                                            edgecolor='face', zorder=-1,
+                                            facecolor='#EFEFDB')
+        return coastline, ocean, land
+    return tuple(cfeature.ShapelyFeature(
+                     list(feature.intersecting_geometries(extent)), 
+                     feature.crs, **feature.kwargs) 
+                 for feature in get_map_features())
+
+def add_map_features(ax, extent, show_axes, clip=True):
+    # features are clipped to the extent unless the view may move beyond
+    # it, as in interactive plots
+    try:
+        ax.set_extent(extent, crs=plate_carree)
+    except ValueError:
+        raise ValueError("The specified extent or values cannot be "
+                         "plotted using Cartopy. Please ensure that you "
+                         "are using valid latitude and longitude values. "
+                         "Extent should be formatted as [minimum_x, "
+                         "maximum_x, minimum_y, maximum_y].")
+    if clip:
+        features = get_map_features(tuple(extent))
+    else:
+        features = get_map_features()
+    feature_artists = [ax.add_feature(feature) for feature in features]
+    gl = ax.gridlines(draw_labels=show_axes)
+    gl.xlabels_top=False
+    gl.ylabels_right=False
+    return feature_artists
+
 def add_legend(ax2, colour_scale, colormap, colour_mapping, shape_scale, 
                frequency_scale, shape, shape_pos, shape_neg, divergent, 
                scale_x, scale_y, colour_label, shape_label):
@@ -90,130 +185,85 @@ def add_legend(ax2, colour_scale, colormap, colour_mapping, shape_scale,
         ax2.annotate(shape_scale[i], (x_positions[1]+1.1, ymax-(i+1.25)), 
                        ha='center', va='center', size=label_size)
 
-def vizent_plot(x_values, y_values, colour_values, shape_values, size_values, 
-                colormap="viridis", scale_x=None, scale_y=None, 
-                use_image=False, image_type=None, image_file=None, 
-                use_cartopy=False, extent=None, scale_diverges=None, 
-                shape="sine", shape_pos="sine", shape_neg="square", 
-                colour_max=None, colour_min=None, colour_n=None, 
-                colour_spread=None, shape_max=None, shape_min=None, 
-                shape_n=None, shape_spread=None, colour_label="temperature", 
-                shape_label="variance", title=None, x_label=None, 
-                y_label=None, show_axes=True, save=False, 
-                file_name="saved_plot.png", return_axes=False, 
-                scale_dp=1, interval_type="closest", show_legend=True):
+def glyph_spacing(data_extent, size, **params):
     """
-    Draws a scatter plot of the provided points. 
-    Each point is displayed as a Visual Entropy glyph. 
+    Returns the spacing in data units (x, y) at which glyphs of the 
+    given diameter in points just touch, when points covering 
+    data_extent are plotted by vizent_figure with the given 
+    parameters. The spacing is measured from the axes of a figure laid 
+    out with glyphs at the corners of data_extent, so it allows for the 
+    figure size, legend, labels, title, margins and map projection. 
+    With use_cartopy, the spacing is in degrees, and is that needed 
+    where a degree of latitude is shortest on screen.
+    """
+    fig, ax1 = vizent_figure(data_extent[:2], data_extent[2:], [0, 1], 
+                             [0, 1], [size]*2, **params)
+    ax1.apply_aspect()
+    box = ax1.get_window_extent()
+    points_per_pixel = 72 / fig.dpi
+    spacing_x = (size * abs(np.diff(ax1.get_xlim())[0]) 
+                 / (box.width*points_per_pixel))
+    spacing_y = (size * abs(np.diff(ax1.get_ylim())[0]) 
+                 / (box.height*points_per_pixel))
+    if not params.get("use_cartopy"):
+        return spacing_x, spacing_y
 
-    Parameters:
-        x_values (list of floats): list of x coordinates
-        y_values (list of floats): list of y coordinates
-        colour_values (list of floats): list of values to be 
-                                        represented by colour
-        shape_values (list of floats): list of values to be 
-                                       represented by shape
-        size_values (list of floats): list of values for 
-                                      diameter of glyphs in 
-                                      points.
-        colormap (colormap or registered colormap name): 
-                             Optional. Default is metoffice 
-                             colour scheme. Use any matplotlib 
-                             colormap.        
-        scale_x (float): Optional. Defines x size of plot window
-                         in inches.
-        scale_y (float): Optional. Defines y size of plot window
-                         in inches.       
-        use_image (bool): Optional. If True, plot on an image 
-                          background.        
-        image_type (str): Optional. Use preset image type. 
-                          "newcastle" for detailed 3d render
-                          of newcastle (use eastings and
-                          northings for x and y), "england" 
-                          for OSM england map (use grid ref)
-        image_file (str): Optional. Use any image file. Please
-                          specify absolute path. You must
-                          also specify the extent.
-        use_cartopy (bool): Optional. Plot the points on
-                            Cartopy map. 
-        extent (list of floats): Optional. Axis limits or 
-                                 extent of coordinates for 
-                                 Cartopy. A list of four 
-                                 values: [xmin, xmax, ymin, 
-                                 ymax]   
-        scale_diverges (bool): Optional. If True, diverging 
-                               sets of glyphs are used for 
-                               positive and negative values.
-        shape (str): Optional. Glyph shape design to use.
-                     Use shape_pos and shape_neg for 
-                     divergent scale. Default is sine.
-        shape_pos (str): Optional. When using divergent
-                         scale, glyph shape design to use
-                         for positive values.
-        shape_neg (str): Optional. When using divergent
-                         scale, glyph shape design to use
-                         for negative values.
-        colour_max (float): Optional. Maximum value to use
-                            for colour in key.
-        colour_min (float): Optional. Minimum value to use
-                            for colour in key.
-        colour_n (int): Optional. Number of colour values
-                        to be shown in key.
-        colour_spread (float): Optional. Total range of 
-                               colour values in key. Only
-                               use if not specifying max
-                               and min.
-        shape_max (float): Optional. Maximum value to use
-                           for shape in key.
-        shape_min (float): Optional. Minimum value to use
-                           for shape in key.
-        shape_n (int): Optional. Number of shape values
-                       to be shown in key. If using a
-                       diverging scale, this is the 
-                       number of positive values 
-                       including zero. Negative values 
-                       will reflect positive values.
-        shape_spread (float): Optional. Total range of 
-                              shape values in key. Only
-                              use if not specifying max
-                              and min.
-        colour_label (str): Optional. Text label for colour
-                            values in key.
-        shape_label (str): Optional. Text label for shape
-                           values in key.
-        title (str): Optional. Title for the plot.
-        x_label (str): Optional. Label for x axis. Not shown 
-                       for image plots.
-        y_label (str): Optional. Label for y axis. Not shown 
-                       for image plots.
-        show_axes (bool): Optional. If axes are not wanted,
-                          e.g. for image plots, set to False.
-        save (bool): Optional. If True, save the plot as png.
-        file_name (str): Optional. If save, name of saved file.
-        return_axes (bool): Optional. If True, the function 
-                            will return fig, ax1. These can be
-                            used to add more MatPlotLib 
-                            elements, such as lines, text 
-                            boxes.
-        scale_dp (int): Optional. The number of decimal places
-                        that scale values should be rounded to. 
-        interval_type (str): Optional. This defines how the 
-                             shape of each glyph is 
-                             classified:
-                                "closest": use the closest 
-                                           scale value
-                                "limit": use the highest scale 
-                                         value that the glyph 
-                                         value is greater than 
-                                         or equal to (based on 
-                                         modulus for negative 
-                                         values)
-        show_legend (bool): Optional. Specify whether or not
-                            to display the legend to the 
-                            right of the plot.
+    # convert from map coordinates to degrees; a degree of latitude is 
+    # shortest on screen nearest the equator
+    if data_extent[2] * data_extent[3] <= 0:
+        latitude = 0
+    else:
+        latitude = min(abs(data_extent[2]), abs(data_extent[3]))
+    projected = ax1.projection.transform_points(
+        plate_carree, np.array([0, 1, 0]), 
+        np.array([latitude, latitude, latitude+0.001]))
+    per_degree_x = abs(projected[1, 0] - projected[0, 0])
+    per_degree_y = abs(projected[2, 1] - projected[0, 1]) / 0.001
+    return spacing_x / per_degree_x, spacing_y / per_degree_y
+
+def vizent_figure(x_values, y_values, colour_values, shape_values, size_values, 
+                  colormap="viridis", scale_x=None, scale_y=None, 
+                  use_image=False, image_type=None, image_file=None, 
+                  use_cartopy=False, extent=None, scale_diverges=None, 
+                  shape="sine", shape_pos="sine", shape_neg="square", 
+                  colour_max=None, colour_min=None, colour_n=None, 
+                  colour_spread=None, shape_max=None, shape_min=None, 
+                  shape_n=None, shape_spread=None, colour_label="temperature", 
+                  shape_label="variance", title=None, x_label=None, 
+                  y_label=None, show_axes=True, scale_dp=1, 
+                  interval_type="closest", show_legend=True, 
+                  interactive=False, max_glyphs=1000, rasterize=False, 
+                  fig=None):
+    """
+    Draws the plot described in vizent_plot onto a matplotlib Figure 
+    and returns fig, ax1. Unlike vizent_plot, this never touches 
+    global pyplot state: unless a figure is passed in as fig, a new 
+    Figure with its own Agg canvas is used. Separate calls can 
+    therefore run concurrently in threads, and figures are freed 
+    once they are no longer referenced, without plt.close.
+
+    Parameters are as for vizent_plot, except save, file_name,
+    return_axes and dpi, plus:
+        fig (Figure): Optional. Figure to draw on.
     """
+    params = dict(locals())
+    for name in ["x_values", "y_values", "colour_values", "shape_values",
+                 "size_values", "fig"]:
+        del params[name]
+
     # Check and sanitise inputs
 
+    # gridded fields are cropped and subsampled to points first
+    if is_gridded(colour_values):
+        if not isinstance(size_values, (int, float)):
+            raise TypeError("size_values must be a single number when "
+                            "plotting gridded fields")
+        size = size_values
+        x_values, y_values, colour_values, shape_values = grid_to_points(
+            colour_values, shape_values, extent, 
+            lambda grid_extent: glyph_spacing(grid_extent, size, **params))
+        size_values = [size_values]*len(x_values)
+
     # lists are all of same length
     if not (len(x_values) == len(y_values) == len(colour_values) 
             == len(shape_values) == len(size_values)):
@@ -222,15 +272,15 @@ def vizent_plot(x_values, y_values, colour_values, shape_values, size_values,
     if not len(x_values) > 0:
         raise ValueError("Empty input lists")
     # lists contain only numerical values
-    if not all(isinstance(i, (int, float)) for i in x_values):
+    if not is_numeric(x_values):
         raise TypeError("x values must be numeric")
-    if not all(isinstance(i, (int, float)) for i in y_values):
+    if not is_numeric(y_values):
         raise TypeError("y values must be numeric")
-    if not all(isinstance(i, (int, float)) for i in colour_values):
+    if not is_numeric(colour_values):
         raise TypeError("colour values must be numeric")
-    if not all(isinstance(i, (int, float)) for i in shape_values):
+    if not is_numeric(shape_values):
         raise TypeError("shape values must be numeric")
-    if not all(isinstance(i, (int, float)) for i in size_values):
+    if not is_numeric(size_values):
         raise TypeError("size values must be numeric")
 
     # valid shape is specified
@@ -269,11 +319,8 @@ def vizent_plot(x_values, y_values, colour_values, shape_values, size_values,
     
     # if extent is not supplied, generate based on data
     if extent==None:
-        if use_cartopy or use_image:
-            pad = (max(max(x_values)-min(x_values), 
-                       max(y_values)-min(y_values)))/10
-            extent = [min(x_values)-pad, max(x_values)+pad, 
-                    min(y_values)-pad, max(y_values)+pad]
+        if use_cartopy or use_image or interactive:
+            extent = padded_extent(x_values, y_values)
     # check extent is of correct format
     elif not isinstance(extent, list):
         raise TypeError("extent must be a list of four values. Extent "
@@ -283,91 +330,80 @@ def vizent_plot(x_values, y_values, colour_values, shape_values, size_values,
         raise ValueError("invalid extent. Extent should be formatted as "
                          "[minimum_x, maximum_x, minimum_y, maximum_y].")
     else:
-        if (extent[0]>min(x_values) or extent[1]<max(x_values) 
-            or extent[2]>min(y_values) or extent[3]<max(y_values)):
+        if (extent[0]>np.min(x_values) or extent[1]<np.max(x_values) 
+            or extent[2]>np.min(y_values) or extent[3]<np.max(y_values)):
             print("Warning: specified extent excludes some data.")
 
-    # set up subplots
+    # set up subplots on an explicit figure, without pyplot state
+    if fig is None:
+        fig = Figure()
+        FigureCanvasAgg(fig)
     if show_legend:
-        gs = gridspec.GridSpec(1, 2, width_ratios=[2, 1]) 
+        gs = gridspec.GridSpec(1, 2, figure=fig, width_ratios=[2, 1]) 
     else:
-        gs = gridspec.GridSpec(1, 2, width_ratios=[1, 0]) 
-    fig = plt.figure()
+        gs = gridspec.GridSpec(1, 2, figure=fig, width_ratios=[1, 0]) 
 
+    # artists that are rasterised with rasterize
+    raster_artists = []
     if use_cartopy:
-        ax1 = plt.subplot(gs[0], projection=ccrs.Mercator())
-        ax1.coastlines('50m', zorder=0)
-        try:
-            ax1.set_extent(extent)
-        except ValueError:
-            raise ValueError("The specified extent or values cannot be "
-                             "plotted using Cartopy. Please ensure that you "
-                             "are using valid latitude and longitude values. "
-                             "Extent should be formatted as [minimum_x, "
-                             "maximum_x, minimum_y, maximum_y].")
-
-        ax1.add_feature(cfeature.NaturalEarthFeature('physical', 'ocean', 
-                                                     '50m', edgecolor='face', 
-                                                     facecolor='#B3CFDD',
-                                                     zorder=-1))
-        ax1.add_feature(cfeature.NaturalEarthFeature('physical', 'land', '50m',
-                                                     edgecolor='face', 
-                                                     zorder=-1,
-                                                     facecolor='#EFEFDB'))                                              
-        gl = ax1.gridlines(draw_labels=show_axes)
-        gl.xlabels_top=False
-        gl.ylabels_right=False
+        ax1 = fig.add_subplot(gs[0], projection=mercator)
+        raster_artists += add_map_features(ax1, extent, show_axes,
+                                           clip=not interactive)
     else:
-        ax1 = plt.subplot(gs[0])
-    ax2 = plt.subplot(gs[1])                 
+        ax1 = fig.add_subplot(gs[0])
+    ax2 = fig.add_subplot(gs[1])                 
 
     asp=None
     if use_image:
+        image, image_extent = get_image(x_values, y_values, image_type, 
+                                        image_file, extent)
         if image_type=="newcastle" or image_type=="england":
-            extent = get_image(x_values,y_values,image_type,image_file)[1]
+            extent = image_extent
         try:
-            asp = add_image_background(get_image(x_values,y_values, image_type, 
-                                                 image_file)[0], ax1, extent) 
+            asp = add_image_background(image, ax1, extent) 
+            raster_artists += ax1.images
         except:
             print("Image file not found or not valid. Figure will be created "
                   "without image background.")
             use_image=False
    
-    if scale_diverges == None:
-        scale_diverges = scale_is_divergent(shape_values)
-    
-    if colour_n == None:
-        if shape_n == None:
-            if scale_diverges:
-                colour_n = 7
-            else:
-                colour_n = 5
-        else:
-            if scale_diverges:
-                colour_n = (2*shape_n)-1
-            else:
-                colour_n = shape_n     
-    
+    (scale_diverges, colour_scale, colour_mapping, shape_scale,
+     frequency_scale) = get_scales(colour_values, shape_values, colormap,
+                                   scale_diverges, colour_max, colour_min,
+                                   colour_n, colour_spread, shape_max,
+                                   shape_min, shape_n, shape_spread, scale_dp)
+
     # plot the points
-    colour_scale = get_colour_scale(colour_values, colour_max, colour_min, 
-                                    colour_n, colour_spread, scale_dp)
-    colour_mapping = get_colour_mapping(colour_scale, colormap)
-    shape_scale = get_shape_scale(shape_values, shape_max, shape_min, shape_n, 
-                                  scale_diverges, shape_spread, scale_dp) 
-    frequency_scale = get_frequency_scale(shape_scale, scale_diverges)
-
-    for i in range(len(x_values)):
-        add_point(x_values[i], 
-                  y_values[i], 
-                  get_shape(shape_values[i], shape, scale_diverges, shape_pos, 
-                            shape_neg),
-                  get_frequency(shape_values[i], shape_scale, frequency_scale, 
-                                interval_type),
-                  get_colour(colour_values[i], colormap, colour_mapping),
-                  size_values[i], ax1, use_cartopy) 
+    if interactive:
+        glyph_x, glyph_y = x_values, y_values
+        if use_cartopy:
+            glyph_x, glyph_y = project_points(ax1, x_values, y_values)
+        glyphs = InteractiveGlyphs(ax1, glyph_x, glyph_y, colour_values, 
+                                   shape_values, size_values, colormap, 
+                                   colour_mapping, shape_scale, 
+                                   frequency_scale, shape, shape_pos, 
+                                   shape_neg, scale_diverges, interval_type,
+                                   max_glyphs, rasterized=rasterize)
+        if extent is not None:
+            if use_cartopy:
+                ax1.set_extent(extent, crs=plate_carree)
+            else:
+                ax1.set_xlim(extent[0],extent[1])
+                ax1.set_ylim(extent[2],extent[3])
+        glyphs.connect()
+    else:
+        raster_artists += add_points(ax1, x_values, y_values, colour_values, 
+                                     shape_values, size_values, colormap, 
+                                     colour_mapping, shape_scale, 
+                                     frequency_scale, shape, shape_pos, 
+                                     shape_neg, scale_diverges, 
+                                     interval_type, use_cartopy)
+    if rasterize:
+        for artist in raster_artists:
+            artist.set_rasterized(True)
     if extent is not None:
         if use_cartopy:
-            ax1.set_extent(extent)
+            ax1.set_extent(extent, crs=plate_carree)
         else:
             ax1.set_xlim(extent[0],extent[1])
             ax1.set_ylim(extent[2],extent[3])
@@ -417,12 +453,12 @@ def vizent_plot(x_values, y_values, colour_values, shape_values, size_values,
         ax2.set_aspect(aspect)
     
     ax1.margins(0.1)
-    plt.subplots_adjust(wspace=0.1)
+    fig.subplots_adjust(wspace=0.1)
     if title is not None:
         delim_title = title.split("\n")
         max_length = max(len(line) for line in delim_title)
         font_size = min(18, 1.5*(scale_x/(max_length*0.014)))
-        plt.suptitle(title, fontsize=font_size, fontweight="bold")
+        fig.suptitle(title, fontsize=font_size, fontweight="bold")
     ax1.set_xlabel(x_label)
     ax1.set_ylabel(y_label)
         
@@ -430,21 +466,237 @@ def vizent_plot(x_values, y_values, colour_values, shape_values, size_values,
         ax1.axis('off') 
 
     fig.canvas.draw()
-    plt.tight_layout()
+    fig.tight_layout()
 
     if not show_legend:
         ax2.axis('off')
-        plt.subplots_adjust(wspace=0)
+        fig.subplots_adjust(wspace=0)
+
+    return fig, ax1
+
+def vizent_plot(x_values, y_values, colour_values, shape_values, size_values, 
+                colormap="viridis", scale_x=None, scale_y=None, 
+                use_image=False, image_type=None, image_file=None, 
+                use_cartopy=False, extent=None, scale_diverges=None, 
+                shape="sine", shape_pos="sine", shape_neg="square", 
+                colour_max=None, colour_min=None, colour_n=None, 
+                colour_spread=None, shape_max=None, shape_min=None, 
+                shape_n=None, shape_spread=None, colour_label="temperature", 
+                shape_label="variance", title=None, x_label=None, 
+                y_label=None, show_axes=True, save=False, 
+                file_name="saved_plot.png", return_axes=False, 
+                scale_dp=1, interval_type="closest", show_legend=True, 
+                interactive=False, max_glyphs=1000, rasterize=False, 
+                dpi=500, cache=None):
+    """
+    Draws a scatter plot of the provided points. 
+    Each point is displayed as a Visual Entropy glyph. 
+
+    Parameters:
+        x_values (list of floats): list of x coordinates
+        y_values (list of floats): list of y coordinates
+        colour_values (list of floats): list of values to be 
+                                        represented by colour. 
+                                        Alternatively a 2D 
+                                        xarray DataArray or 
+                                        Dataset, see below.
+        shape_values (list of floats): list of values to be 
+                                       represented by shape
+        size_values (list of floats): list of values for 
+                                      diameter of glyphs in 
+                                      points.
+        colormap (colormap or registered colormap name): 
+                             Optional. Default is metoffice 
+                             colour scheme. Use any matplotlib 
+                             colormap.        
+        scale_x (float): Optional. Defines x size of plot window
+                         in inches.
+        scale_y (float): Optional. Defines y size of plot window
+                         in inches.       
+        use_image (bool): Optional. If True, plot on an image 
+                          background.        
+        image_type (str): Optional. Use preset image type. 
+                          "newcastle" for detailed 3d render
+                          of newcastle (use eastings and
+                          northings for x and y), "england" 
+                          for OSM england map (use grid ref)
+        image_file (str): Optional. Use any image file. Please
+                          specify absolute path. You must
+                          also specify the extent.
+        use_cartopy (bool): Optional. Plot the points on
+                            Cartopy map. 
+        extent (list of floats): Optional. Axis limits or 
+                                 extent of coordinates for 
+                                 Cartopy. A list of four 
+                                 values: [xmin, xmax, ymin, 
+                                 ymax]   
+        scale_diverges (bool): Optional. If True, diverging 
+                               sets of glyphs are used for 
+                               positive and negative values.
+        shape (str): Optional. Glyph shape design to use.
+                     Use shape_pos and shape_neg for 
+                     divergent scale. Default is sine.
+        shape_pos (str): Optional. When using divergent
+                         scale, glyph shape design to use
+                         for positive values.
+        shape_neg (str): Optional. When using divergent
+                         scale, glyph shape design to use
+                         for negative values.
+        colour_max (float): Optional. Maximum value to use
+                            for colour in key.
+        colour_min (float): Optional. Minimum value to use
+                            for colour in key.
+        colour_n (int): Optional. Number of colour values
+                        to be shown in key.
+        colour_spread (float): Optional. Total range of 
+                               colour values in key. Only
+                               use if not specifying max
+                               and min.
+        shape_max (float): Optional. Maximum value to use
+                           for shape in key.
+        shape_min (float): Optional. Minimum value to use
+                           for shape in key.
+        shape_n (int): Optional. Number of shape values
+                       to be shown in key. If using a
+                       diverging scale, this is the 
+                       number of positive values 
+                       including zero. Negative values 
+                       will reflect positive values.
+        shape_spread (float): Optional. Total range of 
+                              shape values in key. Only
+                              use if not specifying max
+                              and min.
+        colour_label (str): Optional. Text label for colour
+                            values in key.
+        shape_label (str): Optional. Text label for shape
+                           values in key.
+        title (str): Optional. Title for the plot.
+        x_label (str): Optional. Label for x axis. Not shown 
+                       for image plots.
+        y_label (str): Optional. Label for y axis. Not shown 
+                       for image plots.
+        show_axes (bool): Optional. If axes are not wanted,
+                          e.g. for image plots, set to False.
+        save (bool): Optional. If True, save the plot as png.
+        file_name (str): Optional. If save, name of saved file.
+        return_axes (bool): Optional. If True, the function 
+                            will return fig, ax1. These can be
+                            used to add more MatPlotLib 
+                            elements, such as lines, text 
+                            boxes.
+        scale_dp (int): Optional. The number of decimal places
+                        that scale values should be rounded to. 
+        interval_type (str): Optional. This defines how the 
+                             shape of each glyph is 
+                             classified:
+                                "closest": use the closest 
+                                           scale value
+                                "limit": use the highest scale 
+                                         value that the glyph 
+                                         value is greater than 
+                                         or equal to (based on 
+                                         modulus for negative 
+                                         values)
+        show_legend (bool): Optional. Specify whether or not
+                            to display the legend to the 
+                            right of the plot.
+        interactive (bool): Optional. If True, only the glyphs
+                            in view are drawn, and they are 
+                            redrawn when the plot is panned or
+                            zoomed in an interactive backend.
+        max_glyphs (int): Optional. With interactive, the 
+                          maximum number of glyphs drawn. If 
+                          more points are in view, nearby 
+                          points are shown as a single glyph
+                          of their mean values.
+        rasterize (bool): Optional. If True, the glyphs and the 
+                          map or image background are stored 
+                          as images at the given dpi when 
+                          saving to a vector format such as 
+                          PDF or SVG. Text, axes, gridlines and 
+                          the legend stay vector, and files 
+                          with many glyphs are much smaller 
+                          and faster to open.
+        dpi (float): Optional. Resolution of the saved plot, or 
+                     of its rasterised parts with rasterize.
+        cache (RenderCache): Optional. With save, a plot saved 
+                             before from the same data and 
+                             parameters is written from the cache 
+                             rather than drawn again.
+
+    Gridded fields: colour_values and shape_values may be 2D 
+    xarray DataArrays (optionally dask-backed) or single variable 
+    Datasets. x_values and y_values are then ignored and 
+    size_values is a single glyph diameter. The fields are cropped 
+    to extent and subsampled so that glyphs do not overlap at the 
+    figure size; only the data needed is loaded.
+    """
+    params = dict(locals())
+    for name in ["save", "file_name", "return_axes", "dpi", "cache"]:
+        del params[name]
+
+    if save and not return_axes and cache is not None:
+        # savefig adds the default format to names without an extension
+        image_format = os.path.splitext(file_name)[1][1:].lower()
+        if not image_format:
+            image_format = plt.rcParams["savefig.format"]
+            file_name = "{0}.{1}".format(file_name, image_format)
+        data = vizent_render(format=image_format, dpi=dpi, cache=cache, 
+                             **params)
+        with open(file_name, "wb") as f:
+            f.write(data)
+        return
+
+    if return_axes or not save:
+        # the figure is handed to pyplot to be shown or extended
+        fig, ax1 = vizent_figure(fig=plt.figure(), **params)
+    else:
+        fig, ax1 = vizent_figure(**params)
 
     if return_axes:
         return fig, ax1
     elif save:
         try:
-            plt.savefig(file_name, dpi=500)
+            fig.savefig(file_name, dpi=dpi)
         except AttributeError:
             raise AttributeError("The specified file name is invalid. File "
                                  "name must be a string with or without a "
                                  "valid image file extension")
     else:
         plt.show()
-    plt.close()
\ No newline at end of file
+        plt.close(fig)
+
+def vizent_render(*args, format="png", dpi=500, cache=None, **kwargs):
+    """
+    Renders the plot described in vizent_plot and returns the image 
+    file contents as bytes, without using pyplot. Safe to call from 
+    several threads at once.
+
+    Parameters are as for vizent_figure, plus:
+        format (str): Optional. Output file format, e.g. "png",
+                      "pdf" or "svg".
+        dpi (float): Optional. Resolution of the output, or of 
+                     its rasterised parts with rasterize and a 
+                     vector format.
+        cache (RenderCache): Optional. If given, a plot rendered 
+                             before from the same data and 
+                             parameters is returned from the cache 
+                             rather than drawn again.
+    """
+    if cache is not None:
+        # key on parameter names, so positional and keyword calls match
+        params = signature(vizent_figure).bind(*args, **kwargs)
+        params.apply_defaults()
+        params = dict(params.arguments)
+        if params["fig"] is None:
+            del params["fig"]
+            key = render_key(params, format, dpi)
+            data = cache.get(key)
+            if data is None:
+                data = vizent_render(format=format, dpi=dpi, **params)
+                cache.put(key, data)
+            return data
+    fig, ax1 = vizent_figure(*args, **kwargs)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=format, dpi=dpi)
+    return buffer.getvalue()